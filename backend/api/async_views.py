@@ -0,0 +1,274 @@
+"""
+Асинхронные представления чтения для запуска под ASGI.
+
+Теги, продукты и рецепты (списки и отдельные объекты) читаются через
+асинхронный ORM, поэтому воркер не простаивает, пока ждёт базу, и
+медленные запросы (выгрузка списка покупок, загрузка изображений) не
+занимают его целиком. Ответы те же, что у ViewSet из api.views: те же
+сериализаторы, ETag, фильтры и постраничный вывод. Запросы с другими
+методами, с аутентификацией не по токену и запросы браузерного API
+передаются синхронным ViewSet.
+
+Подключаются в api.urls при ASYNC_READ_VIEWS (включается в asgi.py).
+"""
+
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import Http404, JsonResponse
+from django.utils.cache import (get_conditional_response, patch_vary_headers,
+                                quote_etag)
+from django.utils.http import http_date
+from django_filters.utils import translate_validation
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.views import exception_handler
+
+from api.conditions import (aget_list_etag, aget_updated_at, arecipe_etag,
+                            arecipe_last_modified, make_etag)
+from api.constants import INGREDIENTS_SEARCH_LIMIT, RECIPE_CACHE_TIMEOUT
+from api.filters import IngredientFilter, RecipeFilter
+from api.paginations import Pagination
+from api.serializers import (IngredientSerializer, RecipeReadSerializer,
+                             SubscriptionsResolver, TagSerializer,
+                             prefetch_recipes)
+from api.views import (IngredientViewSet, RecipeViewSet, TagViewSet,
+                       with_user_state)
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.tokens import aget_token
+
+
+def not_found(model):
+    """Ошибка 404 с тем же текстом, что у get_object_or_404."""
+    return Http404(
+        f'No {model._meta.object_name} matches the given query.'
+    )
+
+
+def json_response(data, status=200):
+    """Ответ в JSON, как у JSONRenderer."""
+    return JsonResponse(
+        data, status=status, safe=False, encoder=JSONEncoder,
+        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')}
+    )
+
+
+async def aauthenticate(request):
+    """Пользователь по заголовку Authorization: Token <ключ>.
+
+    Токен берётся из того же кеша, что у CachedTokenAuthentication.
+    None, если заголовок другой или токен неверный: такие запросы
+    обрабатывает синхронный ViewSet (BasicAuthentication, ответ 401).
+    """
+    credentials = request.headers.get('Authorization', '').split()
+    if not credentials:
+        return AnonymousUser()
+    if len(credentials) != 2 or credentials[0].lower() != 'token':
+        return None
+    token = await aget_token(credentials[1])
+    if token is None or not token.user.is_active:
+        return None
+    return token.user
+
+
+def read_view(sync_view):
+    """Асинхронное представление GET; остальные запросы - sync_view."""
+    def decorator(read):
+        @wraps(read)
+        async def view(request, *args, **kwargs):
+            if request.method in ('GET', 'HEAD') and not (
+                'format' in request.GET
+                or 'text/html' in request.headers.get('Accept', '')
+            ):
+                user = await aauthenticate(request)
+                if user is not None:
+                    request.user = user
+                    try:
+                        response = await read(request, *args, **kwargs)
+                    except (APIException, Http404) as exc:
+                        response = exception_handler(exc, {})
+                        response = json_response(
+                            response.data, response.status_code
+                        )
+                    patch_vary_headers(response, ('Accept',))
+                    return response
+            return await sync_to_async(sync_view)(request, *args, **kwargs)
+        view.csrf_exempt = True
+        return view
+    return decorator
+
+
+async def respond(request, get_data, etag=None, last_modified=None):
+    """Ответ 304 или данные get_data(), с заголовками ETag и Last-Modified.
+
+    То же, что django.views.decorators.http.condition.
+    """
+    etag = quote_etag(etag) if etag is not None else None
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(
+        request, etag=etag, last_modified=timestamp
+    )
+    if response is None:
+        response = json_response(await get_data())
+    if timestamp and not response.has_header('Last-Modified'):
+        response.headers['Last-Modified'] = http_date(timestamp)
+    if etag:
+        response.headers.setdefault('ETag', etag)
+    return response
+
+
+async def afilter(filterset):
+    """Запрос после фильтров.
+
+    Проверка значений фильтров может обращаться к базе, поэтому идёт
+    синхронно.
+    """
+    def get_queryset():
+        if not filterset.is_valid():
+            raise translate_validation(filterset.errors)
+        return filterset.qs
+    return await sync_to_async(get_queryset)()
+
+
+async def aserialize_recipes(request, recipes):
+    """Отображения рецептов, как у RecipeListSerializer.
+
+    Кеш отображений, подписки на авторов и данные рецептов, которых нет
+    в кеше, загружаются заранее, чтобы сериализатор не обращался к базе.
+    """
+    serializer = RecipeReadSerializer(context={'request': request})
+    keys = [serializer.get_cache_key(recipe) for recipe in recipes]
+    cached_recipes = await cache.aget_many(keys)
+    missing = [
+        recipe for recipe, key in zip(recipes, keys)
+        if key not in cached_recipes
+    ]
+    if missing:
+        await sync_to_async(prefetch_recipes)(missing)
+    subscriptions = SubscriptionsResolver(request)
+    await subscriptions.aload({recipe.author_id for recipe in recipes})
+    context = {
+        'request': request,
+        'cached_recipes': cached_recipes,
+        'subscriptions': subscriptions,
+        'new_recipes': {},
+    }
+    data = RecipeReadSerializer(recipes, many=True, context=context).data
+    if context['new_recipes']:
+        await cache.aset_many(context['new_recipes'], RECIPE_CACHE_TIMEOUT)
+    return data
+
+
+async def read_object(request, model, serializer_class, pk):
+    """Объект с ETag и Last-Modified, как у get_detail_etag."""
+    updated_at = await aget_updated_at(model, pk)
+    if updated_at is None:
+        raise not_found(model)
+
+    async def get_data():
+        obj = await model.objects.filter(pk=pk).afirst()
+        if obj is None:
+            raise not_found(model)
+        return serializer_class(obj).data
+
+    return await respond(
+        request, get_data,
+        etag=make_etag(model._meta.label, pk, updated_at),
+        last_modified=updated_at
+    )
+
+
+@read_view(TagViewSet.as_view({'get': 'list'}))
+async def tag_list(request):
+    """Теги."""
+    async def get_data():
+        return TagSerializer(
+            [tag async for tag in Tag.objects.all()], many=True
+        ).data
+
+    return await respond(
+        request, get_data, etag=await aget_list_etag(Tag, request)
+    )
+
+
+@read_view(TagViewSet.as_view({'get': 'retrieve'}))
+async def tag_detail(request, pk):
+    """Тег."""
+    return await read_object(request, Tag, TagSerializer, pk)
+
+
+@read_view(IngredientViewSet.as_view({'get': 'list'}))
+async def ingredient_list(request):
+    """Продукты, как у IngredientViewSet.list."""
+    async def get_data():
+        if request.GET.get('search'):
+            ingredients = await afilter(IngredientFilter(
+                request.GET, Ingredient.objects.all(), request=request
+            ))
+            ingredients = ingredients[:INGREDIENTS_SEARCH_LIMIT]
+        elif request.GET.get('name'):
+            return await sync_to_async(ingredient_index.search)(
+                request.GET['name'], INGREDIENTS_SEARCH_LIMIT
+            )
+        else:
+            ingredients = Ingredient.objects.all()
+        return IngredientSerializer(
+            [ingredient async for ingredient in ingredients], many=True
+        ).data
+
+    return await respond(
+        request, get_data, etag=await aget_list_etag(Ingredient, request)
+    )
+
+
+@read_view(IngredientViewSet.as_view({'get': 'retrieve'}))
+async def ingredient_detail(request, pk):
+    """Продукт."""
+    return await read_object(request, Ingredient, IngredientSerializer, pk)
+
+
+@read_view(RecipeViewSet.as_view({'get': 'list', 'post': 'create'}))
+async def recipe_list(request):
+    """Рецепты."""
+    recipes = await afilter(RecipeFilter(
+        request.GET,
+        with_user_state(Recipe.objects.all(), request.user),
+        request=request
+    ))
+    paginator = Pagination()
+    recipes = await paginator.apaginate_queryset(
+        recipes, Request(request), view=RecipeViewSet
+    )
+    return json_response(paginator.get_paginated_response(
+        await aserialize_recipes(request, recipes)
+    ).data)
+
+
+@read_view(RecipeViewSet.as_view({
+    'get': 'retrieve', 'patch': 'partial_update', 'delete': 'destroy'
+}))
+async def recipe_detail(request, pk):
+    """Рецепт с ETag по данным текущего пользователя."""
+    user = request.user
+    etag = await arecipe_etag(user, pk)
+    if etag is None:
+        raise not_found(Recipe)
+
+    async def get_data():
+        recipe = await with_user_state(
+            Recipe.objects.filter(pk=pk), user
+        ).afirst()
+        if recipe is None:
+            raise not_found(Recipe)
+        return (await aserialize_recipes(request, [recipe]))[0]
+
+    response = await respond(
+        request, get_data, etag=etag,
+        last_modified=await arecipe_last_modified(user, pk)
+    )
+    patch_vary_headers(response, ('Authorization',))
+    return response
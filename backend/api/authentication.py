@@ -0,0 +1,38 @@
+"""Аутентификация по токену с кешем (recipes.tokens)."""
+
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import SAFE_METHODS
+
+from recipes.tokens import get_query, get_token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication, который берёт токен и пользователя из кеша.
+
+    Из кеша пользователь берётся только для безопасных методов: в
+    запросах на запись (аватар, смена пароля) его сохраняют, поэтому он
+    читается из базы.
+    """
+
+    cached = False
+
+    def authenticate(self, request):
+        """Пользователь и токен по заголовку Authorization."""
+        self.cached = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        """Пользователь и токен; ошибка, как у TokenAuthentication."""
+        if self.cached:
+            token = get_token(key)
+        else:
+            token = get_query(key).first()
+        if token is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        return (token.user, token)
@@ -0,0 +1,149 @@
+"""
+Условные GET-запросы (ETag и Last-Modified).
+
+Функции для django.views.decorators.http.condition: по ним ответ 304
+отдаётся до выборки объектов и работы сериализатора. Функции с
+префиксом a - то же для асинхронных представлений (api.async_views).
+"""
+
+from hashlib import md5
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Exists, Max, OuterRef
+
+from recipes.models import Favorites, Recipe, ShoppingCart, Subscriptions
+
+
+def make_etag(*values):
+    """Значение ETag из данных, от которых зависит ответ."""
+    return md5(repr(values).encode()).hexdigest()
+
+
+LIST_STATE = {'count': Count('pk'), 'updated_at': Max('updated_at')}
+
+
+def make_list_etag(model, request, state):
+    """Значение ETag списка по состоянию таблицы."""
+    return make_etag(
+        model._meta.label, state['count'], state['updated_at'],
+        request.GET.urlencode()
+    )
+
+
+def get_list_etag(model):
+    """Значение ETag списка: число объектов и время изменения."""
+    def etag(request, *args, **kwargs):
+        return make_list_etag(
+            model, request, model.objects.aggregate(**LIST_STATE)
+        )
+    return etag
+
+
+async def aget_list_etag(model, request):
+    """Значение ETag списка для асинхронного представления."""
+    return make_list_etag(
+        model, request, await model.objects.aaggregate(**LIST_STATE)
+    )
+
+
+def filter_pk(model, pk):
+    """Объекты модели с ключом pk из адреса.
+
+    Для ключа не того типа - пустой запрос без обращения к базе, чтобы
+    представление само ответило 404.
+    """
+    try:
+        pk = model._meta.pk.to_python(pk)
+    except (TypeError, ValueError, ValidationError):
+        return model.objects.none()
+    return model.objects.filter(pk=pk)
+
+
+def get_updated_at_query(model, pk):
+    """Запрос времени изменения объекта."""
+    return filter_pk(model, pk).values_list('updated_at', flat=True)
+
+
+def get_updated_at(model):
+    """Время изменения объекта для Last-Modified."""
+    def last_modified(request, pk, *args, **kwargs):
+        return get_updated_at_query(model, pk).first()
+    return last_modified
+
+
+async def aget_updated_at(model, pk):
+    """Время изменения объекта для асинхронного представления."""
+    return await get_updated_at_query(model, pk).afirst()
+
+
+def get_detail_etag(model):
+    """Значение ETag объекта по времени его изменения."""
+    def etag(request, pk, *args, **kwargs):
+        updated_at = get_updated_at(model)(request, pk)
+        if updated_at is None:
+            return None
+        return make_etag(model._meta.label, pk, updated_at)
+    return etag
+
+
+def get_recipe_state_query(user, pk):
+    """Запрос данных, от которых зависит отображение рецепта.
+
+    Кроме времени изменения рецепта это данные текущего пользователя:
+    избранное, список покупок и подписка на автора.
+    """
+    recipes = filter_pk(Recipe, pk)
+    fields = ['updated_at']
+    if user.is_authenticated:
+        recipes = recipes.annotate(
+            favorited=Exists(Favorites.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_subscribed=Exists(Subscriptions.objects.filter(
+                subscriber=user, author=OuterRef('author')
+            )),
+        )
+        fields += ['favorited', 'in_shopping_cart', 'is_subscribed']
+    return recipes.values_list(*fields)
+
+
+def make_recipe_etag(user, pk, state):
+    """Значение ETag рецепта по его состоянию."""
+    if state is None:
+        return None
+    return make_etag('recipe', pk, user.pk, *state)
+
+
+def recipe_etag(request, pk, *args, **kwargs):
+    """Значение ETag рецепта."""
+    return make_recipe_etag(
+        request.user, pk,
+        get_recipe_state_query(request.user, pk).first()
+    )
+
+
+async def arecipe_etag(user, pk):
+    """Значение ETag рецепта для асинхронного представления."""
+    return make_recipe_etag(
+        user, pk, await get_recipe_state_query(user, pk).afirst()
+    )
+
+
+def recipe_last_modified(request, pk, *args, **kwargs):
+    """Last-Modified рецепта только для анонимного пользователя.
+
+    Для остальных ответ зависит ещё и от их избранного и подписок.
+    """
+    if request.user.is_authenticated:
+        return None
+    return get_updated_at(Recipe)(request, pk)
+
+
+async def arecipe_last_modified(user, pk):
+    """Last-Modified рецепта для асинхронного представления."""
+    if user.is_authenticated:
+        return None
+    return await aget_updated_at(Recipe, pk)
@@ -1,3 +1,6 @@
 """Константы для приложения api."""
 
 PAGE_SIZE_PAGINATOR = 6
+INGREDIENTS_SEARCH_LIMIT = 100
+RECIPE_CACHE_TIMEOUT = 24 * 60 * 60
+IMAGE_MAX_PIXELS = 40_000_000
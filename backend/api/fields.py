@@ -0,0 +1,82 @@
+"""Поля сериализаторов."""
+
+from django import forms
+from django.core.files.uploadedfile import UploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework import serializers
+
+from api.constants import IMAGE_MAX_PIXELS
+
+
+def get_objects(queryset, ids):
+    """Объекты по списку id одним запросом; ошибка со всеми ненайденными."""
+    objects = queryset.in_bulk(set(ids))
+    missing = [id for id in dict.fromkeys(ids) if id not in objects]
+    if missing:
+        raise serializers.ValidationError(
+            f'Не найдены объекты с id: {", ".join(map(str, missing))}.'
+        )
+    return [objects[id] for id in ids]
+
+
+class PrimaryKeyListField(serializers.ListField):
+    """Список id объектов queryset, проверяемый одним запросом."""
+
+    child = serializers.IntegerField()
+
+    def __init__(self, queryset, **kwargs):
+        """Набор объектов, среди которых ищутся id."""
+        self.queryset = queryset
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        """Объекты по списку id."""
+        return get_objects(
+            self.queryset.all(), super().to_internal_value(data)
+        )
+
+    def to_representation(self, value):
+        """Список id объектов."""
+        if hasattr(value, 'all'):
+            value = value.all()
+        return [obj.pk for obj in value]
+
+
+class DjangoImageField(forms.ImageField):
+    """Изображение без проверки расширения в имени файла."""
+
+    default_validators = []
+
+
+class ImageField(Base64ImageField):
+    """Изображение в base64 или файлом из multipart/form-data.
+
+    Файл проверяется Pillow по заголовку (Image.open и verify, без
+    загрузки всего изображения), а имя файла заменяется расширением
+    найденного формата.
+    """
+
+    def __init__(self, **kwargs):
+        """Формат проверяется по содержимому, а не по имени файла."""
+        kwargs.setdefault('_DjangoImageField', DjangoImageField)
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        """Файл изображения из строки base64 или загруженного файла."""
+        if not isinstance(data, UploadedFile):
+            return super().to_internal_value(data)
+        file = serializers.ImageField.to_internal_value(self, data)
+        image_format = (file.image.format or '').lower()
+        # MPO - JPEG с несколькими кадрами, так снимают многие камеры.
+        extension = (
+            'jpg' if image_format in ('jpeg', 'mpo') else image_format
+        )
+        if extension not in self.ALLOWED_TYPES:
+            raise serializers.ValidationError(self.INVALID_TYPE_MESSAGE)
+        width, height = file.image.size
+        if width * height > IMAGE_MAX_PIXELS:
+            raise serializers.ValidationError(
+                f'Изображение больше {IMAGE_MAX_PIXELS} пикселей.'
+            )
+        file.name = f'image.{extension}'
+        return file
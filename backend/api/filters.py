@@ -1,10 +1,31 @@
 """Фильтрация рецептов и продуктов."""
 
 import django_filters
+from django.db import connections
+from django.db.models import (BooleanField, Case, FloatField, Func, Q, Value,
+                              When)
+from django.db.models.functions import Upper
 
+from api.constants import INGREDIENTS_SEARCH_LIMIT
+from recipes.ingredient_index import ingredient_index
 from recipes.models import DBUser, Ingredient, Recipe, Tag
 
 
+class Similarity(Func):
+    """Похожесть строк по триграммам (pg_trgm)."""
+
+    function = 'SIMILARITY'
+    output_field = FloatField()
+
+
+class TrigramSimilar(Func):
+    """Похожи ли строки по триграммам (оператор % из pg_trgm)."""
+
+    arg_joiner = ' %% '
+    template = '(%(expressions)s)'
+    output_field = BooleanField()
+
+
 class RecipeFilter(django_filters.FilterSet):
     """Фильтр по данным рецепта."""
 
@@ -62,9 +83,44 @@ class IngredientFilter(django_filters.FilterSet):
     name = django_filters.CharFilter(
         field_name='name', lookup_expr='istartswith'
     )
+    search = django_filters.CharFilter(method='ranked_search')
 
     class Meta:
         """Мета класс фильтра продуктов."""
 
         model = Ingredient
         fields = ['name']
+
+    def ranked_search(self, ingredients, name, value):
+        """Поиск с опечатками и по середине названия.
+
+        Сначала продукты, название которых начинается с value, затем
+        содержащие value, затем похожие по триграммам. В PostgreSQL
+        поиск идёт по GIN-индексу pg_trgm, в остальных базах — по
+        снимку продуктов в памяти.
+        """
+        value = value.strip()
+        if connections[ingredients.db].vendor == 'postgresql':
+            upper_name = Upper('name')
+            query = Upper(Value(value))
+            return ingredients.filter(
+                Q(name__icontains=value) | TrigramSimilar(upper_name, query)
+            ).annotate(
+                search_rank=Case(
+                    When(name__istartswith=value, then=0),
+                    When(name__icontains=value, then=1),
+                    default=2,
+                ),
+                similarity=Similarity(upper_name, query),
+            ).order_by('search_rank', '-similarity', 'name')
+        ids = [
+            ingredient['id'] for ingredient in ingredient_index.fuzzy_search(
+                value, INGREDIENTS_SEARCH_LIMIT
+            )
+        ]
+        if not ids:
+            return ingredients.none()
+        return ingredients.filter(id__in=ids).order_by(Case(*(
+            When(id=ingredient_id, then=position)
+            for position, ingredient_id in enumerate(ids)
+        )))
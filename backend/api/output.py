@@ -10,26 +10,38 @@ TEMPLATE = {
 }
 
 
-def get_output(recipes, ingredients_info):
-    """Формирование тела СпискаПокупок."""
+def get_lines(recipes, ingredients_info):
+    """Строки СпискаПокупок."""
     current_date = format_date(
         date.today(),
         format='d MMMM yyyy',
         locale='ru_RU'
     )
-    return '\n'.join([
-        'Список покупок от {}'.format(current_date),
-        'Нужно купить:',
-        *[TEMPLATE['ingredients'].format(
+    yield 'Список покупок от {}'.format(current_date)
+    yield 'Нужно купить:'
+    for i, ingredient_info in enumerate(ingredients_info, 1):
+        yield TEMPLATE['ingredients'].format(
             number=i,
             total_amount=ingredient_info['total_amount'],
             measurement_unit=ingredient_info['ingredient__measurement_unit'],
-            name=ingredient_info['ingredient__name'].capitalize())
-            for i, ingredient_info in enumerate(ingredients_info, 1)],
-        'Что бы приготовить:',
-        *[TEMPLATE['recipe'].format(
+            name=ingredient_info['ingredient__name'].capitalize()
+        )
+    yield 'Что бы приготовить:'
+    for i, recipe in enumerate(recipes, 1):
+        yield TEMPLATE['recipe'].format(
             number=i,
             name=recipe['name'],
-            author=recipe['author__username'])
-            for i, recipe in enumerate(recipes, 1)],
-    ])
+            author=recipe['author__username']
+        )
+
+
+def get_output(recipes, ingredients_info):
+    """Формирование тела СпискаПокупок по строкам.
+
+    Данные читаются из recipes и ingredients_info по мере отдачи ответа,
+    поэтому весь файл в памяти не собирается.
+    """
+    lines = get_lines(recipes, ingredients_info)
+    yield next(lines)
+    for line in lines:
+        yield '\n' + line
@@ -1,12 +1,185 @@
 """Настройки построничного вывода."""
 
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 from api.constants import PAGE_SIZE_PAGINATOR
 
 
 class Pagination(PageNumberPagination):
-    """Построничный вывод."""
+    """Построничный вывод.
+
+    Если у представления задан cursor_ordering, а в запросе есть параметр
+    cursor (хотя бы пустой), вывод идёт по курсору: страница выбирается
+    условием по полям cursor_ordering после последнего показанного
+    объекта, без COUNT(*) и OFFSET. Без cursor работают page и limit.
+    apaginate_queryset - то же с запросами через асинхронный ORM.
+    """
 
     page_size = PAGE_SIZE_PAGINATOR
     page_size_query_param = "limit"
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Выбор страницы по номеру или по курсору."""
+        if not self.set_cursor_mode(request, view):
+            return super().paginate_queryset(queryset, request, view)
+        return self.get_cursor_page(
+            list(self.get_cursor_queryset(queryset, request))
+        )
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Выбор страницы через асинхронный ORM."""
+        if not self.set_cursor_mode(request, view):
+            return await self.apaginate_by_number(queryset, request)
+        return self.get_cursor_page([
+            obj async for obj in self.get_cursor_queryset(queryset, request)
+        ])
+
+    async def apaginate_by_number(self, queryset, request):
+        """Страница по номеру: PageNumberPagination.paginate_queryset."""
+        self.request = request
+        paginator = self.django_paginator_class(
+            queryset, self.get_page_size(request)
+        )
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            ))
+        self.page.object_list = [obj async for obj in self.page.object_list]
+        return list(self.page)
+
+    def set_cursor_mode(self, request, view):
+        """Выбор вывода по курсору; True, если он используется."""
+        ordering = getattr(view, 'cursor_ordering', None)
+        self.use_cursor = (
+            ordering is not None
+            and self.cursor_query_param in request.query_params
+        )
+        if self.use_cursor:
+            self.request = request
+            self.display_page_controls = False
+            self.cursor_fields = [
+                (name.lstrip('-'), name.startswith('-')) for name in ordering
+            ]
+        return self.use_cursor
+
+    def get_cursor_queryset(self, queryset, request):
+        """Запрос страницы после курсора (на один объект больше)."""
+        self.cursor_page_size = self.get_page_size(request)
+        self.position, self.reverse = self.decode_cursor(
+            queryset.model, request
+        )
+        fields = [
+            (name, descending != self.reverse)
+            for name, descending in self.cursor_fields
+        ]
+        if self.position is not None:
+            queryset = queryset.filter(
+                self.get_seek_filter(fields, self.position)
+            )
+        return queryset.order_by(*(
+            f'-{name}' if descending else name for name, descending in fields
+        ))[:self.cursor_page_size + 1]
+
+    def get_cursor_page(self, objects):
+        """Объекты страницы и соседние страницы по результату запроса."""
+        has_more = len(objects) > self.cursor_page_size
+        objects = objects[:self.cursor_page_size]
+        if self.reverse:
+            objects.reverse()
+        self.next_object = objects[-1] if objects and (
+            has_more if not self.reverse else self.position is not None
+        ) else None
+        self.previous_object = objects[0] if objects and (
+            has_more if self.reverse else self.position is not None
+        ) else None
+        return objects
+
+    def get_seek_filter(self, fields, position):
+        """Условие «после позиции» для набора полей сортировки."""
+        seek = Q()
+        equal = Q()
+        for (name, descending), value in zip(fields, position):
+            seek |= equal & Q(
+                **{f'{name}__{"lt" if descending else "gt"}': value}
+            )
+            equal &= Q(**{name: value})
+        return seek
+
+    def decode_cursor(self, model, request):
+        """Позиция и направление из параметра cursor."""
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if len(data['p']) != len(self.cursor_fields):
+                raise ValueError
+            position = [
+                model._meta.get_field(name).to_python(value)
+                for (name, _), value in zip(self.cursor_fields, data['p'])
+            ]
+            return position, bool(data['r'])
+        except (binascii.Error, ValueError, TypeError, KeyError,
+                ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, reverse):
+        """Ссылка на страницу после (или перед) объектом."""
+        data = json.dumps({
+            'p': [
+                obj._meta.get_field(name).value_to_string(obj)
+                for name, _ in self.cursor_fields
+            ],
+            'r': int(reverse),
+        })
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(
+            url,
+            self.cursor_query_param,
+            base64.urlsafe_b64encode(data.encode()).decode()
+        )
+
+    def get_next_link(self):
+        """Ссылка на следующую страницу."""
+        if not self.use_cursor:
+            return super().get_next_link()
+        if self.next_object is None:
+            return None
+        return self.encode_cursor(self.next_object, reverse=False)
+
+    def get_previous_link(self):
+        """Ссылка на предыдущую страницу."""
+        if not self.use_cursor:
+            return super().get_previous_link()
+        if self.previous_object is None:
+            return None
+        return self.encode_cursor(self.previous_object, reverse=True)
+
+    def get_paginated_response(self, data):
+        """Ответ со страницей, без count в режиме курсора."""
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
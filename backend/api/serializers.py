@@ -1,11 +1,21 @@
 """Проверка и преобразование."""
 
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.db.models.manager import BaseManager
 from djoser.serializers import UserSerializer as DjoserUserSerializer
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
+from api.constants import RECIPE_CACHE_TIMEOUT
+from api.fields import ImageField, PrimaryKeyListField, get_objects
 from recipes.constants import MIN_AMOUNT
-from recipes.models import DBUser, Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.images import get_srcset
+from recipes.models import (DBUser, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCartIngredient, Tag)
+from recipes.shopping_list import recipe_ingredients_changed
 from recipes.validators import validate_username
 
 
@@ -14,7 +24,7 @@ class IngredientSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Ingredient
-        fields = '__all__'
+        fields = ('id', 'name', 'measurement_unit')
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -22,29 +32,120 @@ class TagSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Tag
-        fields = '__all__'
+        fields = ('id', 'name', 'slug')
+
+
+class SubscriptionsResolver:
+    """Подписки текущего пользователя на авторов из ответа.
+
+    Идентификаторы авторов собираются заранее (add), а подписки на всех
+    ещё не проверенных авторов запрашиваются одним запросом при первой
+    необходимости.
+    """
+
+    def __init__(self, request):
+        """Пользователь запроса и собранные авторы."""
+        self.user = getattr(request, 'user', None)
+        self.pending = set()
+        self.checked = set()
+        self.subscribed = set()
+
+    def add(self, authors_ids):
+        """Авторы, подписку на которых надо будет проверить."""
+        self.pending.update(authors_ids)
+
+    async def aload(self, authors_ids):
+        """Проверка подписок заранее, через асинхронный ORM."""
+        authors_ids = set(authors_ids) - self.checked
+        if authors_ids and self.user is not None and (
+            self.user.is_authenticated
+        ):
+            self.subscribed.update([
+                author_id async for author_id in self.user.subscribers.filter(
+                    author_id__in=authors_ids
+                ).values_list('author_id', flat=True)
+            ])
+        self.checked.update(authors_ids)
+
+    def is_subscribed(self, author):
+        """Подписан ли пользователь на автора."""
+        if hasattr(author, 'is_subscribed'):
+            return author.is_subscribed
+        return self.is_subscribed_to(author.id)
+
+    def is_subscribed_to(self, author_id):
+        """Подписан ли пользователь на автора с author_id."""
+        if self.user is None or not self.user.is_authenticated:
+            return False
+        if author_id not in self.checked:
+            authors_ids = (self.pending | {author_id}) - self.checked
+            self.subscribed.update(self.user.subscribers.filter(
+                author_id__in=authors_ids
+            ).values_list('author_id', flat=True))
+            self.checked.update(authors_ids)
+            self.pending.clear()
+        return author_id in self.subscribed
+
+
+def get_subscriptions_resolver(context):
+    """Общий для всех сериализаторов ответа SubscriptionsResolver."""
+    if 'subscriptions' not in context:
+        context['subscriptions'] = SubscriptionsResolver(
+            context.get('request', None)
+        )
+    return context['subscriptions']
+
+
+class AuthorsListSerializer(serializers.ListSerializer):
+    """Список объектов с пакетной проверкой подписок на их авторов."""
+
+    def to_representation(self, data):
+        """Сбор авторов перед отображением списка."""
+        items = list(data.all() if isinstance(data, BaseManager) else data)
+        get_subscriptions_resolver(self.context).add(
+            self.child.get_author_id(item) for item in items
+        )
+        return super().to_representation(items)
+
+
+def get_image_srcset(serializer, file, variants):
+    """Копии изображения для srcset с абсолютными ссылками."""
+    request = serializer.context.get('request', None)
+    return get_srcset(
+        file, variants,
+        request.build_absolute_uri if request is not None else str
+    )
 
 
 class UsersSerializer(DjoserUserSerializer):
     """Отображение пользователей."""
 
     is_subscribed = serializers.SerializerMethodField()
+    avatar_srcset = serializers.SerializerMethodField()
 
     class Meta(DjoserUserSerializer.Meta):
         model = DBUser
-        fields = (*DjoserUserSerializer.Meta.fields, 'is_subscribed', 'avatar')
+        fields = (
+            *DjoserUserSerializer.Meta.fields, 'is_subscribed', 'avatar',
+            'avatar_srcset'
+        )
+        list_serializer_class = AuthorsListSerializer
 
     def validate_username(self, username):
         """Проверка имени пользователя."""
         return validate_username(username)
 
+    def get_author_id(self, user):
+        """Автор для AuthorsListSerializer."""
+        return user.id
+
     def get_is_subscribed(self, user):
         """Получение подписок пользователя."""
-        request = self.context.get('request', None)
-        return (
-            request is not None and request.user.is_authenticated
-            and request.user.subscribers.filter(author=user).exists()
-        )
+        return get_subscriptions_resolver(self.context).is_subscribed(user)
+
+    def get_avatar_srcset(self, user):
+        """Уменьшенные копии аватара."""
+        return get_image_srcset(self, user.avatar, user.avatar_variants)
 
 
 class RecipeIngredientReadSerializer(serializers.ModelSerializer):
@@ -62,8 +163,53 @@ class RecipeIngredientReadSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
+def prefetch_recipes(recipes):
+    """Загрузка автора, тегов и продуктов рецептов, если их ещё нет."""
+    prefetch_related_objects(
+        recipes,
+        'author',
+        'tags',
+        Prefetch(
+            'recipeingredients',
+            queryset=RecipeIngredient.objects.select_related('ingredient')
+        ),
+    )
+
+
+class RecipeListSerializer(AuthorsListSerializer):
+    """Список рецептов.
+
+    Отображения рецептов берутся из кеша одним запросом, а теги,
+    продукты и авторы загружаются только для рецептов, которых в кеше нет.
+    Если кеш уже загружен (cached_recipes в контексте), ничего не
+    загружается.
+    """
+
+    def to_representation(self, data):
+        """Загрузка кеша и недостающих данных перед отображением."""
+        recipes = list(data.all() if isinstance(data, BaseManager) else data)
+        if 'cached_recipes' not in self.context:
+            cached_recipes = cache.get_many(
+                [self.child.get_cache_key(recipe) for recipe in recipes]
+            )
+            self.context['cached_recipes'] = cached_recipes
+            prefetch_recipes([
+                recipe for recipe in recipes
+                if self.child.get_cache_key(recipe) not in cached_recipes
+            ])
+        return super().to_representation(recipes)
+
+
 class RecipeReadSerializer(serializers.ModelSerializer):
-    """Отображение рецептов."""
+    """Отображение рецептов.
+
+    Общая для всех пользователей часть отображения кешируется по id и
+    времени изменения рецепта (updated_at меняется и при изменении тегов,
+    продуктов и автора), поверх неё выставляются is_favorited,
+    is_in_shopping_cart и author.is_subscribed текущего пользователя.
+    Если в контексте есть словарь new_recipes, новые отображения
+    складываются в него, а не в кеш.
+    """
 
     tags = TagSerializer(many=True)
     ingredients = RecipeIngredientReadSerializer(
@@ -74,53 +220,125 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
     author = UsersSerializer()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         fields = (
             'id', 'tags', 'author', 'ingredients', 'is_favorited',
-            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time'
+            'is_in_shopping_cart', 'name', 'image', 'image_srcset', 'text',
+            'cooking_time'
         )
         model = Recipe
         read_only_fields = fields
+        list_serializer_class = RecipeListSerializer
+
+    def get_author_id(self, recipe):
+        """Автор для AuthorsListSerializer."""
+        return recipe.author_id
 
-    def get_filter(self, obj):
-        """Поиск наличия записи."""
+    def get_cache_key(self, recipe):
+        """Ключ кеша отображения рецепта."""
+        request = self.context.get('request', None)
+        return 'recipe:{}:{}:{}'.format(
+            recipe.pk,
+            recipe.updated_at.isoformat(),
+            request.build_absolute_uri('/') if request is not None else ''
+        )
+
+    def to_representation(self, recipe):
+        """Отображение рецепта из кеша с данными текущего пользователя."""
+        key = self.get_cache_key(recipe)
+        cached_recipes = self.context.get('cached_recipes', None)
+        if cached_recipes is not None:
+            data = cached_recipes.get(key)
+        else:
+            data = cache.get(key)
+        if data is None:
+            prefetch_recipes([recipe])
+            data = super().to_representation(recipe)
+            shared_data = dict(
+                data, is_favorited=None, is_in_shopping_cart=None,
+                author=dict(data['author'], is_subscribed=None)
+            )
+            new_recipes = self.context.get('new_recipes', None)
+            if new_recipes is not None:
+                new_recipes[key] = shared_data
+            else:
+                cache.set(key, shared_data, RECIPE_CACHE_TIMEOUT)
+            return data
+        data['is_favorited'] = self.get_is_favorited(recipe)
+        data['is_in_shopping_cart'] = self.get_is_in_shopping_cart(recipe)
+        data['author']['is_subscribed'] = get_subscriptions_resolver(
+            self.context
+        ).is_subscribed_to(recipe.author_id)
+        return data
+
+    def get_filter(self, obj, annotation=None):
+        """Поиск наличия записи.
+
+        Если значение уже посчитано в запросе рецептов (annotation),
+        повторный запрос в базу не выполняется.
+        """
+        if annotation is not None:
+            return annotation
         request = self.context.get('request', None)
         return (
             request is not None and request.user.is_authenticated
             and obj.filter(user=request.user).exists()
         )
 
+    def get_image_srcset(self, recipe):
+        """Уменьшенные копии изображения."""
+        return get_image_srcset(self, recipe.image, recipe.image_variants)
+
     def get_is_favorited(self, obj):
         """Проверка наличия в избранном."""
-        return self.get_filter(obj.is_favorited)
+        return self.get_filter(
+            obj.is_favorited, getattr(obj, 'favorited', None)
+        )
 
     def get_is_in_shopping_cart(self, obj):
         """Проверка наличия в списке покупок."""
-        return self.get_filter(obj.is_in_shopping_cart)
+        return self.get_filter(
+            obj.is_in_shopping_cart, getattr(obj, 'in_shopping_cart', None)
+        )
+
+
+class RecipeIngredientListSerializer(serializers.ListSerializer):
+    """Продукты рецепта; все id проверяются одним запросом."""
+
+    def to_internal_value(self, data):
+        """Продукты вместо id."""
+        ingredients_amounts = super().to_internal_value(data)
+        for ingredient_amount, ingredient in zip(
+            ingredients_amounts,
+            get_objects(Ingredient.objects.all(), [
+                ingredient_amount['id']
+                for ingredient_amount in ingredients_amounts
+            ])
+        ):
+            ingredient_amount['id'] = ingredient
+        return ingredients_amounts
 
 
 class RecipeIngredientCreateSerializer(serializers.ModelSerializer):
     """Для сохранения ингредиентов рецепта."""
 
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(),
-    )
+    id = serializers.IntegerField()
     amount = serializers.IntegerField(min_value=MIN_AMOUNT)
 
     class Meta:
         model = RecipeIngredient
         fields = ('id', 'amount')
+        list_serializer_class = RecipeIngredientListSerializer
 
 
 class RecipeWriteSerializer(serializers.ModelSerializer):
     """Сохранение рецепта."""
 
-    # tags = serializers.PrimaryKeyRelatedField(        # лишний и без него всё сохраняет
-    #     queryset=Tag.objects.all(), many=True, required=True
-    # ) 
+    tags = PrimaryKeyListField(queryset=Tag.objects.all(), required=True)
     ingredients = RecipeIngredientCreateSerializer(many=True, required=True)
-    image = Base64ImageField(use_url=True, required=True)
+    image = ImageField(use_url=True, required=True)
     cooking_time = serializers.IntegerField(min_value=MIN_AMOUNT)
 
     class Meta:
@@ -135,9 +353,11 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
 
     def find_double(self, ids):
         """Проверка на дубли."""
-        double = set(
-            element.id for element in ids if ids.count(element) >= 2
-        )
+        double = {
+            id for id, count in Counter(
+                element.id for element in ids
+            ).items() if count >= 2
+        }
         if double:
             raise serializers.ValidationError(
                 f'Есть дубли: {double}.'
@@ -177,6 +397,32 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             ) for ing in ingredients
         )
 
+    def update_recipes(self, recipe, ingredients):
+        """Запись только изменившихся продуктов рецепта."""
+        amounts = {ing['id'].id: ing['amount'] for ing in ingredients}
+        changed = []
+        removed = []
+        for recipe_ingredient in recipe.recipeingredients.all():
+            amount = amounts.pop(recipe_ingredient.ingredient_id, None)
+            if amount is None:
+                removed.append(recipe_ingredient.pk)
+            elif amount != recipe_ingredient.amount:
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+        if removed:
+            RecipeIngredient.objects.filter(pk__in=removed).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ('amount',))
+        if amounts:
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient_id=ingredient_id,
+                    amount=amount
+                ) for ingredient_id, amount in amounts.items()
+            )
+
+    @transaction.atomic
     def create(self, validated_data):
         """Сохранение рецепта."""
         ingredients = validated_data.pop('ingredients')
@@ -186,11 +432,16 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         self.save_recipes(recipe, ingredients)
         return recipe
     
+    @transaction.atomic
     def update(self, instance, validated_data):
-        """Изменение рецепта."""
+        """Изменение рецепта.
+
+        Продукты и теги (ModelSerializer меняет их через set()) меняются
+        только на разницу с сохранёнными, в одной транзакции с рецептом.
+        """
         # instance.tags.set(validated_data.pop('tags'))  # лишний и без него всё сохраняет
-        instance.ingredients.clear()
-        self.save_recipes(instance, validated_data.pop('ingredients'))
+        with recipe_ingredients_changed(instance):
+            self.update_recipes(instance, validated_data.pop('ingredients'))
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
@@ -202,36 +453,58 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
 class MinRecipeSerializer(serializers.ModelSerializer):
     """Отображение рецепта с минимальными данными."""
 
+    image_srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_srcset', 'cooking_time')
         read_only_fields = fields
 
+    def get_image_srcset(self, recipe):
+        """Уменьшенные копии изображения."""
+        return get_image_srcset(self, recipe.image, recipe.image_variants)
+
 
 class UsersSubscriptionsSerializer(UsersSerializer):
     """Пользователи с рецептами, на которых подписались."""
 
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField(source='recipes.count')
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta(UsersSerializer.Meta):
         fields = (*UsersSerializer.Meta.fields, 'recipes', 'recipes_count')
 
     def get_recipes(self, obj):
-        """Выводим репецпы на кого подписались."""
+        """Выводим репецпы на кого подписались.
+
+        Рецепты уже ограничены recipes_limit в UsersViewSet.with_recipes.
+        """
         return MinRecipeSerializer(
-            obj.recipes.all()[:int(
-                self.context.get('request').GET.get('recipes_limit', 10**10)
-            )],
+            obj.limited_recipes,
             many=True,
             context=self.context
         ).data
 
 
+class ShoppingCartIngredientSerializer(serializers.ModelSerializer):
+    """Продукты списка покупок."""
+
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.CharField(source='ingredient.name')
+    measurement_unit = serializers.CharField(
+        source='ingredient.measurement_unit'
+    )
+
+    class Meta:
+        fields = ('id', 'name', 'measurement_unit', 'total_amount')
+        model = ShoppingCartIngredient
+        read_only_fields = fields
+
+
 class AvatarSerializer(serializers.ModelSerializer):
     """Аватар."""
 
-    avatar = Base64ImageField(use_url=True, required=True)
+    avatar = ImageField(use_url=True, required=True)
 
     class Meta:
         """Мета данных аватара."""
@@ -0,0 +1,87 @@
+"""Аутентификация по токену с кешем (api.authentication)."""
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from recipes.models import DBUser
+from recipes.tokens import get_cache_key
+
+ME_URL = '/api/users/me/'
+SET_PASSWORD_URL = '/api/users/set_password/'
+LOGOUT_URL = '/api/auth/token/logout/'
+
+
+@pytest.fixture
+def token_cache(settings, tmp_path):
+    """TOKEN_CACHE с общим для процессов кешем в файлах."""
+    settings.TOKEN_CACHE = True
+    settings.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': str(tmp_path),
+    }}
+
+
+def get_token_queries(client, method, url):
+    """Ответ и число запросов токена при запросе method к url."""
+    with CaptureQueriesContext(connection) as context:
+        response = getattr(client, method)(url)
+    return response, sum(
+        Token._meta.db_table in query['sql']
+        for query in context.captured_queries
+    )
+
+
+def test_cached_read(token_cache, user_client):
+    """Повторное чтение берёт токен из кеша, без запроса к базе."""
+    response, queries = get_token_queries(user_client, 'get', ME_URL)
+    assert response.status_code == 200
+    assert queries == 1
+    assert cache.get(get_cache_key(Token.objects.get().key)) is not None
+    response, queries = get_token_queries(user_client, 'get', ME_URL)
+    assert response.status_code == 200
+    assert queries == 0
+
+
+def test_write_bypasses_cache(token_cache, user, user_client):
+    """Запросы на запись берут токен и пользователя из базы."""
+    user_client.get(ME_URL)
+    DBUser.objects.filter(pk=user.pk).update(is_active=False)
+    response, queries = get_token_queries(user_client, 'get', ME_URL)
+    assert response.status_code == 200
+    assert queries == 0
+    response, queries = get_token_queries(
+        user_client, 'post', SET_PASSWORD_URL
+    )
+    assert response.status_code == 401
+    assert queries == 1
+
+
+@pytest.mark.parametrize('revoke', ('logout', 'delete', 'deactivate'))
+def test_revoked_token(revoke, token_cache, user, user_client,
+                       django_capture_on_commit_callbacks):
+    """Отозванный токен перестаёт работать сразу, несмотря на кеш."""
+    assert user_client.get(ME_URL).status_code == 200
+    with django_capture_on_commit_callbacks(execute=True):
+        if revoke == 'logout':
+            assert user_client.post(LOGOUT_URL).status_code == 204
+        elif revoke == 'delete':
+            Token.objects.get().delete()
+        else:
+            user.is_active = False
+            user.save()
+    assert user_client.get(ME_URL).status_code == 401
+
+
+def test_local_cache_not_used(settings, user_client):
+    """С кешем в памяти процесса токены не кешируются."""
+    settings.TOKEN_CACHE = True
+    settings.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }}
+    user_client.get(ME_URL)
+    response, queries = get_token_queries(user_client, 'get', ME_URL)
+    assert response.status_code == 200
+    assert queries == 1
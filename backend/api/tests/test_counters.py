@@ -0,0 +1,37 @@
+"""Изменение рецепта не отменяет одновременное изменение счётчиков."""
+
+from api.serializers import RecipeWriteSerializer
+from recipes.models import Favorites, Ingredient, Recipe, Tag
+
+
+def test_patch_keeps_concurrent_favorite(
+    monkeypatch, make_user, user, user_client
+):
+    """Избранное, добавленное между загрузкой и сохранением, учтено."""
+    tag = Tag.objects.create(name='Тег', slug='tag')
+    ingredient = Ingredient.objects.create(
+        name='Продукт', measurement_unit='г'
+    )
+    recipe = Recipe.objects.create(
+        name='Рецепт', text='Описание', cooking_time=1,
+        image='recipes/images/recipe.png', author=user
+    )
+    reader = make_user(1)
+    update = RecipeWriteSerializer.update
+
+    def update_after_favorite(serializer, instance, validated_data):
+        Favorites.objects.create(user=reader, recipe=instance)
+        return update(serializer, instance, validated_data)
+
+    monkeypatch.setattr(
+        RecipeWriteSerializer, 'update', update_after_favorite
+    )
+    response = user_client.patch(f'/api/recipes/{recipe.pk}/', {
+        'name': 'Новое название',
+        'tags': [tag.pk],
+        'ingredients': [{'id': ingredient.pk, 'amount': 2}],
+    }, format='json')
+    assert response.status_code == 200, response.content
+    recipe.refresh_from_db()
+    assert recipe.name == 'Новое название'
+    assert recipe.favorites_count == 1
@@ -0,0 +1,77 @@
+"""Вывод рецептов по курсору."""
+
+import base64
+import json
+
+import pytest
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+
+RECIPES_URL = '/api/recipes/'
+
+
+def get_pages(client, url, link):
+    """Номера рецептов страниц по ссылкам link и последний ответ."""
+    pages = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200, response.content
+        assert 'count' not in response.data
+        pages.append([recipe['id'] for recipe in response.data['results']])
+        url = response.data[link]
+    return pages, response.data
+
+
+def make_cursor(data):
+    """Параметр cursor с данными data."""
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+
+@pytest.fixture
+def recipes(make_recipes):
+    """Рецепты, у части которых одинаковая дата публикации."""
+    ids = [recipe.pk for recipe in make_recipes(11)]
+    now = timezone.now()
+    Recipe.objects.filter(pk__in=ids[2:9]).update(pub_date=now)
+    Recipe.objects.filter(pk__in=ids[9:]).update(
+        pub_date=now + timezone.timedelta(minutes=1)
+    )
+    return list(Recipe.objects.order_by('-pub_date', '-id').values_list(
+        'id', flat=True
+    ))
+
+
+def test_cursor_next(recipes):
+    """По ссылкам next рецепты с равной датой не повторяются и не теряются."""
+    pages, last = get_pages(
+        APIClient(), f'{RECIPES_URL}?cursor=&limit=3', 'next'
+    )
+    assert last['previous'] is not None
+    assert [len(page) for page in pages] == [3, 3, 3, 2]
+    assert sum(pages, []) == recipes
+
+
+def test_cursor_previous(recipes):
+    """По ссылкам previous страницы возвращаются в том же виде."""
+    client = APIClient()
+    pages, last = get_pages(client, f'{RECIPES_URL}?cursor=&limit=3', 'next')
+    previous_pages, first = get_pages(client, last['previous'], 'previous')
+    assert previous_pages[::-1] == pages[:-1]
+    assert first['next'] is not None
+
+
+@pytest.mark.parametrize('cursor', (
+    'не курсор',
+    base64.urlsafe_b64encode(b'not json').decode(),
+    make_cursor({'p': ['2024-01-01T00:00:00+00:00'], 'r': 0}),
+    make_cursor({'p': ['не дата', 1], 'r': 0}),
+    make_cursor({'p': ['2024-01-01T00:00:00+00:00', 'не id'], 'r': 0}),
+    make_cursor({'r': 0}),
+    make_cursor(['2024-01-01T00:00:00+00:00', 1]),
+))
+def test_cursor_invalid(cursor, recipes):
+    """Неверный или подделанный курсор - ответ 404."""
+    response = APIClient().get(RECIPES_URL, {'cursor': cursor})
+    assert response.status_code == 404, response.content
@@ -0,0 +1,25 @@
+"""Число запросов к базе не зависит от числа рецептов на странице."""
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+RECIPES_URL = '/api/recipes/'
+
+
+def count_queries(client, url):
+    """Число запросов к базе при GET url."""
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200, response.content
+    return len(context.captured_queries)
+
+
+@pytest.mark.parametrize('authorized', (False, True))
+def test_recipe_list_queries(authorized, make_recipes, user_client):
+    """Страницы из 1 и 50 рецептов загружаются одним числом запросов."""
+    make_recipes(60)
+    client = user_client if authorized else APIClient()
+    queries = count_queries(client, f'{RECIPES_URL}?limit=1')
+    assert count_queries(client, f'{RECIPES_URL}?limit=50') == queries
@@ -0,0 +1,36 @@
+"""Приём данных эндпоинтами с загрузкой файлов."""
+
+from urllib.parse import urlencode
+
+from rest_framework.test import APIClient
+
+from recipes.models import DBUser
+
+USERS_URL = '/api/users/'
+SET_PASSWORD_URL = '/api/users/set_password/'
+
+
+def test_user_create_form(db):
+    """Регистрация принимает application/x-www-form-urlencoded."""
+    response = APIClient().post(USERS_URL, urlencode({
+        'email': 'form@example.com', 'username': 'form',
+        'first_name': 'Имя', 'last_name': 'Фамилия',
+        'password': 'Pass-word-123',
+    }), content_type='application/x-www-form-urlencoded')
+    assert response.status_code == 201, response.content
+    assert DBUser.objects.filter(email='form@example.com').exists()
+
+
+def test_set_password_form(user, user_client):
+    """Смена пароля принимает application/x-www-form-urlencoded."""
+    response = user_client.post(
+        SET_PASSWORD_URL,
+        urlencode({
+            'current_password': 'Pass-word-123',
+            'new_password': 'New-pass-word-456',
+        }),
+        content_type='application/x-www-form-urlencoded'
+    )
+    assert response.status_code == 204, response.content
+    user.refresh_from_db()
+    assert user.check_password('New-pass-word-456')
@@ -0,0 +1,58 @@
+"""
+Загрузка изображений в multipart/form-data.
+
+Файлы из multipart-запросов записываются во временный файл по частям,
+а при превышении IMAGE_UPLOAD_MAX_SIZE загрузка прерывается ответом
+413, не дочитывая тело запроса в память.
+"""
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+
+
+class FileTooLarge(APIException):
+    """Загружаемый файл больше допустимого размера."""
+
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Файл слишком большой.'
+    default_code = 'file_too_large'
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Запись загружаемого файла во временный файл с ограничением размера."""
+
+    def new_file(self, *args, **kwargs):
+        """Начало нового файла."""
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        """Запись части файла; больше IMAGE_UPLOAD_MAX_SIZE - ошибка."""
+        self.received += len(raw_data)
+        if self.received > settings.IMAGE_UPLOAD_MAX_SIZE:
+            self.file.close()
+            raise FileTooLarge('Размер файла больше {}.'.format(
+                filesizeformat(settings.IMAGE_UPLOAD_MAX_SIZE)
+            ))
+        return super().receive_data_chunk(raw_data, start)
+
+
+class MultiPartUploadMixin:
+    """Миксин приёма данных в JSON, формах и multipart/form-data.
+
+    Список парсеров тот же, что у DRF по умолчанию: формы
+    application/x-www-form-urlencoded нужны эндпоинтам djoser.
+    """
+
+    parser_classes = (JSONParser, FormParser, MultiPartParser)
+
+    def initialize_request(self, request, *args, **kwargs):
+        """Файлы multipart-запросов пишутся во временные файлы."""
+        request.upload_handlers = [
+            LimitedTemporaryFileUploadHandler(request)
+        ]
+        return super().initialize_request(request, *args, **kwargs)
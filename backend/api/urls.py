@@ -1,10 +1,12 @@
 """Url адреса приложения api."""
 
-from django.urls import include, path
+from django.conf import settings
+from django.urls import include, path, re_path
 from rest_framework import routers
 
+from api import async_views
 from api.views import (IngredientViewSet, RecipeViewSet, TagViewSet,
-                       UsersViewSet)
+                       UsersViewSet, database_pool)
 
 router = routers.DefaultRouter()
 router.register('tags', TagViewSet, basename='tags')
@@ -15,4 +17,17 @@ router.register('users', UsersViewSet, basename='users')
 urlpatterns = [
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
+    path('db-pool/', database_pool, name='database_pool'),
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns = [
+        path('tags/', async_views.tag_list),
+        re_path(r'^tags/(?P<pk>[0-9]+)/$', async_views.tag_detail),
+        path('ingredients/', async_views.ingredient_list),
+        re_path(
+            r'^ingredients/(?P<pk>[0-9]+)/$', async_views.ingredient_detail
+        ),
+        path('recipes/', async_views.recipe_list),
+        re_path(r'^recipes/(?P<pk>[0-9]+)/$', async_views.recipe_detail),
+    ] + urlpatterns
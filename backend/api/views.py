@@ -1,29 +1,61 @@
 """Представления приложения api."""
 
+import os
 from datetime import date
 
 import django_filters
-from django.db.models import Sum
-from django.http import FileResponse, Http404
+from django.db import transaction
+from django.db.models import BooleanField, Exists, OuterRef, Prefetch, Value
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.utils.http import content_disposition_header
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_headers
 from djoser.views import UserViewSet as DjoserUserViewSet
-from rest_framework import filters, permissions, serializers, status, viewsets
-from rest_framework.decorators import action
+from rest_framework import permissions, serializers, status, viewsets
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 
+from api.conditions import (get_detail_etag, get_list_etag, get_updated_at,
+                            recipe_etag, recipe_last_modified)
+from api.constants import INGREDIENTS_SEARCH_LIMIT
 from api.filters import IngredientFilter, RecipeFilter
 from api.output import get_output
 from api.paginations import Pagination
 from api.permissions import IsAuthorOrRead
 from api.serializers import (AvatarSerializer, IngredientSerializer,
                              MinRecipeSerializer, RecipeReadSerializer,
-                             RecipeWriteSerializer, TagSerializer,
+                             RecipeWriteSerializer,
+                             ShoppingCartIngredientSerializer, TagSerializer,
                              UsersSerializer, UsersSubscriptionsSerializer)
+from api.uploads import MultiPartUploadMixin
+from foodgram_backend.postgresql.pool import get_stats
+from recipes.ingredient_index import ingredient_index
 from recipes.models import (DBUser, Favorites, Ingredient, Recipe,
-                            RecipeIngredient, ShoppingCart, Subscriptions, Tag)
+                            ShoppingCart, Subscriptions, Tag)
+from recipes.short_links import encode, recipe_exists
 
 
+def with_user_state(recipes, user):
+    """Рецепты с отметками избранного и списка покупок пользователя."""
+    if not user.is_authenticated:
+        return recipes
+    return recipes.annotate(
+        favorited=Exists(Favorites.objects.filter(
+            user=user, recipe=OuterRef('pk')
+        )),
+        in_shopping_cart=Exists(ShoppingCart.objects.filter(
+            user=user, recipe=OuterRef('pk')
+        )),
+    )
+
+
+@method_decorator(condition(etag_func=get_list_etag(Tag)), name='list')
+@method_decorator(condition(
+    etag_func=get_detail_etag(Tag), last_modified_func=get_updated_at(Tag)
+), name='retrieve')
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
     """Теги."""
 
@@ -32,21 +64,47 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
 
 
+@method_decorator(condition(etag_func=get_list_etag(Ingredient)), name='list')
+@method_decorator(condition(
+    etag_func=get_detail_etag(Ingredient),
+    last_modified_func=get_updated_at(Ingredient)
+), name='retrieve')
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     """Продукты."""
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = (
-        django_filters.rest_framework.DjangoFilterBackend,
-        filters.SearchFilter
-    )
+    filter_backends = (django_filters.rest_framework.DjangoFilterBackend,)
     filterset_class = IngredientFilter
-    search_fields = ('^name',)
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        """Поиск по началу названия через индекс в памяти.
+
+        С параметром search — ранжированный поиск IngredientFilter.
+        """
+        if request.query_params.get('search'):
+            return Response(self.get_serializer(
+                self.filter_queryset(
+                    self.get_queryset()
+                )[:INGREDIENTS_SEARCH_LIMIT],
+                many=True
+            ).data)
+        name = request.query_params.get('name')
+        if not name:
+            return super().list(request, *args, **kwargs)
+        return Response(
+            ingredient_index.search(name, INGREDIENTS_SEARCH_LIMIT)
+        )
+
 
-class RecipeViewSet(viewsets.ModelViewSet):
+@method_decorator((
+    vary_on_headers('Authorization'),
+    condition(
+        etag_func=recipe_etag, last_modified_func=recipe_last_modified
+    ),
+), name='retrieve')
+class RecipeViewSet(MultiPartUploadMixin, viewsets.ModelViewSet):
     """Рецепты."""
 
     queryset = Recipe.objects.all()
@@ -57,9 +115,20 @@ class RecipeViewSet(viewsets.ModelViewSet):
         IsAuthorOrRead,
     )
     pagination_class = Pagination
+    cursor_ordering = ('-pub_date', '-id')
     filter_backends = (django_filters.rest_framework.DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        """Рецепты с данными текущего пользователя для отображения.
+
+        Теги, продукты и автор загружаются в RecipeListSerializer только
+        для рецептов, которых нет в кеше.
+        """
+        if self.action not in ('list', 'retrieve'):
+            return super().get_queryset()
+        return with_user_state(Recipe.objects.all(), self.request.user)
+
     def get_serializer_class(self):
         """Выбор сериализатора."""
         if self.action in ['list', 'retrieve']:
@@ -112,48 +181,57 @@ class RecipeViewSet(viewsets.ModelViewSet):
             permission_classes=(permissions.IsAuthenticated,))
     def generete_txt_file(self, request, *args, **kwargs):
         """Формирование файла txt из списка покупок."""
-        user = DBUser.objects.get(username=request.user)
         recipes = Recipe.objects.filter(
-            is_in_shopping_cart__user=user).select_related('author').values(
-                'id',
-                'name',
-                'author__username'
-        )
-        ingredients_info = RecipeIngredient.objects.filter(
-            recipe__in=[recipe['id'] for recipe in recipes]).select_related(
-                'ingredient').values(
-                    'ingredient__name',
-                    'ingredient__measurement_unit'
-        ).annotate(total_amount=Sum('amount')).order_by('ingredient__name')
-        return FileResponse(
+            is_in_shopping_cart__user=request.user
+        ).values('name', 'author__username').iterator()
+        ingredients_info = request.user.shopping_cart_ingredients.values(
+            'ingredient__name',
+            'ingredient__measurement_unit',
+            'total_amount'
+        ).order_by('ingredient__name').iterator()
+        return StreamingHttpResponse(
             get_output(recipes, ingredients_info),
-            filename='ListShopWithProducts_{}.txt'.format(
-                date.today().strftime('%Y.%m.%d')
-            ),
-            as_attachment=True,
-            content_type='text/plain'
+            content_type='text/plain; charset=utf-8',
+            headers={'Content-Disposition': content_disposition_header(
+                as_attachment=True,
+                filename='ListShopWithProducts_{}.txt'.format(
+                    date.today().strftime('%Y.%m.%d')
+                )
+            )}
         )
 
+    @action(detail=False, methods=['get'], url_path='shopping_list',
+            permission_classes=(permissions.IsAuthenticated,))
+    def shopping_list(self, request, *args, **kwargs):
+        """Продукты списка покупок."""
+        return Response(ShoppingCartIngredientSerializer(
+            request.user.shopping_cart_ingredients.select_related(
+                'ingredient'
+            ).order_by('ingredient__name'),
+            many=True
+        ).data)
+
     @action(detail=True, methods=['get'], url_path='get-link',
             permission_classes=(permissions.AllowAny,))
     def get_link(self, request, pk):
         """Короткая ссылка на рецепт."""
-        if not Recipe.objects.filter(id=pk).exists():
-            raise Http404('Рецепта с id={pk} не существует.')
+        if not pk.isdigit() or not recipe_exists.exists(int(pk)):
+            raise Http404(f'Рецепта с id={pk} не существует.')
         return Response(
             {'short-link': request.build_absolute_uri(
-                reverse('short_url_view', args=[pk])
+                reverse('short_url_view', args=[encode(int(pk))])
             )},
             status=status.HTTP_200_OK
         )
 
 
-class UsersViewSet(DjoserUserViewSet):
+class UsersViewSet(MultiPartUploadMixin, DjoserUserViewSet):
     """Пользователи."""
 
     queryset = DBUser.objects.all()
     serializer_class = UsersSerializer
     pagination_class = Pagination
+    cursor_ordering = ('username', 'id')
 
     @action(detail=False, methods=['get'], url_path='me',
             permission_classes=(permissions.IsAuthenticated,))
@@ -162,8 +240,13 @@ class UsersViewSet(DjoserUserViewSet):
         return super().me(request, *args, **kwargs)
 
     @action(detail=False, methods=['put', 'delete'], url_path='me/avatar')
+    @transaction.atomic
     def avatar(self, request, *args, **kwargs):
-        """Добавление/удаление аватора."""
+        """Добавление/удаление аватора.
+
+        В транзакции: файл аватара не удаляется до ссылки на него
+        (recipes.storage).
+        """
         if request.method == 'PUT':
             serializer = AvatarSerializer(
                 request.user, data=request.data, context={'request': request}
@@ -173,22 +256,53 @@ class UsersViewSet(DjoserUserViewSet):
             return Response(serializer.data, status=status.HTTP_200_OK)
         user = request.user
         if user.avatar:
-            user.avatar.delete()
+            # Файл может быть общим: удаляется, когда на него нет ссылок.
+            user.avatar = None
             user.save()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def get_recipes_limit(self):
+        """Количество рецептов автора в подписках."""
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        if recipes_limit is None:
+            return None
+        try:
+            recipes_limit = int(recipes_limit)
+        except ValueError:
+            recipes_limit = -1
+        if recipes_limit < 0:
+            raise serializers.ValidationError(
+                {'recipes_limit': 'Ожидается неотрицательное целое число.'}
+            )
+        return recipes_limit
+
+    def with_recipes(self, authors):
+        """Авторы, на которых подписан пользователь, с их рецептами.
+
+        Количество рецептов берётся из счётчика автора, а первые
+        recipes_limit рецептов всех авторов страницы загружаются одним
+        запросом с ROW_NUMBER() OVER (PARTITION BY author).
+        """
+        recipes = Recipe.objects.all()
+        recipes_limit = self.get_recipes_limit()
+        if recipes_limit is not None:
+            recipes = recipes[:recipes_limit]
+        return authors.annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
+        ).order_by('username').prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='limited_recipes')
+        )
+
     @action(detail=False, methods=['get'], url_path='subscriptions',
             permission_classes=(permissions.IsAuthenticated,))
     def subscriptions(self, request, *args, **kwargs):
         """Просмотр своих подписок."""
-        subscriptions = request.user.subscribers.all()
-        paginator = Pagination()
-        return paginator.get_paginated_response(
+        authors = self.paginate_queryset(self.with_recipes(
+            DBUser.objects.filter(authors__subscriber=request.user)
+        ))
+        return self.get_paginated_response(
             UsersSubscriptionsSerializer(
-                paginator.paginate_queryset(
-                    [subscription.author for subscription in subscriptions],
-                    request
-                ),
+                authors,
                 many=True,
                 context={'request': request}
             ).data
@@ -213,7 +327,7 @@ class UsersViewSet(DjoserUserViewSet):
                     f'Вы уже подписаны на пользователя {author}.'
                 )
             serializer = UsersSubscriptionsSerializer(
-                author,
+                self.with_recipes(DBUser.objects.filter(pk=author.pk)).get(),
                 context={'request': request}
             )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -222,3 +336,10 @@ class UsersViewSet(DjoserUserViewSet):
             author=author)
         ).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def database_pool(request):
+    """Метрики пулов соединений с базой процесса, ответившего на запрос."""
+    return Response({'pid': os.getpid(), 'pools': get_stats()})
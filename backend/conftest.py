@@ -0,0 +1,97 @@
+"""Общие фикстуры тестов."""
+
+import pytest
+from django.core.cache import cache
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import (DBUser, Favorites, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Subscriptions, Tag)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Пустой кеш в начале теста: ответы не берутся из кеша."""
+    cache.clear()
+
+
+@pytest.fixture
+def make_user(db):
+    """Создание пользователя с номером number."""
+    def make(number):
+        return DBUser.objects.create_user(
+            email=f'user{number}@example.com', username=f'user{number}',
+            first_name='Имя', last_name='Фамилия', password='Pass-word-123'
+        )
+    return make
+
+
+@pytest.fixture
+def user(make_user):
+    """Пользователь."""
+    return make_user(0)
+
+
+@pytest.fixture
+def admin_user(db):
+    """Суперпользователь для admin_client из pytest-django."""
+    return DBUser.objects.create_superuser(
+        email='admin@example.com', username='admin',
+        first_name='Имя', last_name='Фамилия', password='Pass-word-123'
+    )
+
+
+@pytest.fixture
+def user_client(user):
+    """Клиент API с токеном пользователя."""
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}'
+    )
+    return client
+
+
+@pytest.fixture
+def make_recipes(db, make_user, user):
+    """Создание count рецептов разных авторов с тегами и продуктами.
+
+    Часть рецептов в избранном и списке покупок пользователя user, на
+    часть авторов он подписан.
+    """
+    def make(count):
+        tags = [
+            Tag.objects.create(name=f'Тег {number}', slug=f'tag{number}')
+            for number in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Продукт {number}', measurement_unit='г'
+            )
+            for number in range(10)
+        ]
+        authors = [make_user(number) for number in range(1, 6)]
+        for author in authors[::2]:
+            Subscriptions.objects.create(subscriber=user, author=author)
+        recipes = []
+        for number in range(count):
+            recipe = Recipe.objects.create(
+                name=f'Рецепт {number}', text='Описание',
+                cooking_time=number + 1, image='recipes/images/recipe.png',
+                author=authors[number % len(authors)]
+            )
+            recipe.tags.set(tags[:number % len(tags) + 1])
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=ingredients[(number + shift) % 10],
+                    amount=shift + 1
+                )
+                for shift in range(3)
+            )
+            if number % 2:
+                Favorites.objects.create(user=user, recipe=recipe)
+            if number % 3:
+                ShoppingCart.objects.create(user=user, recipe=recipe)
+            recipes.append(recipe)
+        return recipes
+    return make
@@ -0,0 +1,44 @@
+"""PostgreSQL с пулом соединений процесса (foodgram_backend.postgresql.pool).
+
+Параметры пула задаются в OPTIONS['pool'] базы.
+"""
+
+from functools import partial
+
+from django.db.backends.postgresql import base
+
+from foodgram_backend.postgresql.pool import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """Соединения берутся из пула и возвращаются в него при закрытии."""
+
+    def get_connection_params(self):
+        """Параметры соединения без параметров пула."""
+        conn_params = super().get_connection_params()
+        conn_params.pop('pool', None)
+        return conn_params
+
+    def get_new_connection(self, conn_params):
+        """Соединение из пула; новое, если свободных нет."""
+        self.pool = get_pool(
+            self.alias, conn_params, self.settings_dict['OPTIONS'].get(
+                'pool', {}
+            )
+        )
+        return self.pool.acquire(
+            partial(super().get_new_connection, conn_params)
+        )
+
+    def _close(self):
+        """Возврат соединения в пул.
+
+        Внутри atomic соединение закрывается: Django оставляет его
+        у себя до конца блока.
+        """
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                if self.in_atomic_block:
+                    self.pool.discard(self.connection)
+                else:
+                    self.pool.release(self.connection)
@@ -0,0 +1,238 @@
+"""
+Пул соединений с PostgreSQL внутри процесса.
+
+Соединение, которое Django закрывает в конце запроса, возвращается в
+пул и отдаётся следующему запросу любого потока, поэтому соединения не
+открываются заново на каждый запрос. Перед выдачей соединение
+проверяется запросом SELECT 1; соединения, открытые дольше max_lifetime
+или простаивающие дольше max_idle секунд, закрываются. Если заняты все
+max_size соединений, запрос ждёт освобождения не дольше timeout секунд.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from psycopg2.extensions import (TRANSACTION_STATUS_IDLE,
+                                 TRANSACTION_STATUS_UNKNOWN)
+
+# Параметры пула по умолчанию, как у psycopg_pool.ConnectionPool.
+DEFAULTS = {
+    'max_size': 10,
+    'timeout': 10.0,
+    'max_idle': 300.0,
+    'max_lifetime': 3600.0,
+    'check': True,
+}
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """Свободное соединение не появилось за timeout секунд."""
+
+
+class ConnectionPool:
+    """Пул соединений одной базы с метриками."""
+
+    def __init__(self, max_size, timeout, max_idle, max_lifetime, check):
+        """Пустой пул; соединения открываются по мере надобности."""
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check = check
+        self.condition = threading.Condition()
+        # (соединение, время возврата в пул), последние - справа.
+        self.idle = deque()
+        # id(соединения) -> время открытия.
+        self.opened_at = {}
+        # Открытые и открывающиеся соединения.
+        self.size = 0
+        self.metrics = {
+            'requests': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'max_wait': 0.0,
+            'timeouts': 0,
+            'opened': 0,
+            'closed': 0,
+            'failed_checks': 0,
+        }
+
+    def take(self, deadline):
+        """Свободное соединение или None, если можно открыть новое.
+
+        Вызывается под блокировкой. Устаревшие соединения убираются из
+        пула и возвращаются вторым значением, чтобы закрыть их без
+        блокировки.
+        """
+        expired = []
+        while True:
+            now = time.monotonic()
+            while self.idle and now - self.idle[0][1] > self.max_idle:
+                expired.append(self.idle.popleft()[0])
+            while self.idle:
+                connection, _ = self.idle.pop()
+                if self.is_obsolete(connection, now):
+                    expired.append(connection)
+                else:
+                    return connection, expired
+            if self.size - len(expired) < self.max_size:
+                self.size += 1
+                return None, expired
+            if expired:
+                return False, expired
+            remaining = deadline - now
+            if remaining <= 0:
+                self.metrics['timeouts'] += 1
+                raise PoolTimeout(
+                    f'Нет свободного соединения с базой за {self.timeout} с '
+                    f'(занято {self.size}).'
+                )
+            self.condition.wait(remaining)
+
+    def acquire(self, connect):
+        """Соединение из пула или новое, открытое connect()."""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        while True:
+            with self.condition:
+                connection, expired = self.take(deadline)
+            for old in expired:
+                self.discard(old)
+            if connection is False:
+                continue
+            waited = time.monotonic() - start
+            if connection is None:
+                try:
+                    connection = connect()
+                except Exception:
+                    with self.condition:
+                        self.size -= 1
+                        self.condition.notify()
+                    raise
+                with self.condition:
+                    self.opened_at[id(connection)] = time.monotonic()
+                    self.metrics['opened'] += 1
+            elif not self.is_usable(connection):
+                with self.condition:
+                    self.metrics['failed_checks'] += 1
+                self.discard(connection)
+                continue
+            with self.condition:
+                self.metrics['requests'] += 1
+                if waited > 0.001:
+                    self.metrics['waits'] += 1
+                    self.metrics['wait_time'] += waited
+                    self.metrics['max_wait'] = max(
+                        self.metrics['max_wait'], waited
+                    )
+            return connection
+
+    def release(self, connection):
+        """Возврат соединения в пул; сломанное соединение закрывается."""
+        if not connection.closed:
+            status = connection.info.transaction_status
+            if status == TRANSACTION_STATUS_UNKNOWN:
+                return self.discard(connection)
+            if status != TRANSACTION_STATUS_IDLE:
+                try:
+                    connection.rollback()
+                except psycopg2.Error:
+                    return self.discard(connection)
+        now = time.monotonic()
+        if connection.closed or self.is_obsolete(connection, now):
+            return self.discard(connection)
+        with self.condition:
+            self.idle.append((connection, now))
+            self.condition.notify()
+
+    def discard(self, connection):
+        """Закрытие соединения и освобождение места в пуле."""
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+        with self.condition:
+            self.opened_at.pop(id(connection), None)
+            self.size -= 1
+            self.metrics['closed'] += 1
+            self.condition.notify()
+
+    def is_obsolete(self, connection, now):
+        """Открыто ли соединение дольше max_lifetime."""
+        opened_at = self.opened_at.get(id(connection), now)
+        return now - opened_at > self.max_lifetime
+
+    def is_usable(self, connection):
+        """Проверка соединения перед выдачей."""
+        if connection.closed:
+            return False
+        if not self.check:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if connection.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    def stats(self):
+        """Метрики: соединения занятые, свободные, ожидание выдачи."""
+        with self.condition:
+            return {
+                'max_size': self.max_size,
+                'in_use': self.size - len(self.idle),
+                'idle': len(self.idle),
+                **self.metrics,
+            }
+
+
+pools = {}
+pools_lock = threading.Lock()
+pools_pid = os.getpid()
+
+
+def get_pool(alias, conn_params, options):
+    """Пул процесса для базы alias с параметрами conn_params.
+
+    После fork пулы родительского процесса не используются: их
+    соединения принадлежат родителю.
+    """
+    global pools_pid
+    key = (alias, tuple(sorted(
+        (name, str(value)) for name, value in conn_params.items()
+    )))
+    with pools_lock:
+        if pools_pid != os.getpid():
+            pools.clear()
+            pools_pid = os.getpid()
+        if key not in pools:
+            pools[key] = ConnectionPool(**{**DEFAULTS, **options})
+        return pools[key]
+
+
+def get_stats():
+    """Метрики всех пулов процесса: {база: метрики}.
+
+    Метрики пулов одной базы (например, служебного соединения к базе
+    postgres) складываются.
+    """
+    with pools_lock:
+        items = list(pools.items())
+    stats = {}
+    for (alias, _), pool in items:
+        pool_stats = pool.stats()
+        if alias in stats:
+            pool_stats = {
+                name: (
+                    max(stats[alias][name], value) if name == 'max_wait'
+                    else stats[alias][name] + value
+                )
+                for name, value in pool_stats.items()
+            }
+        stats[alias] = pool_stats
+    return stats
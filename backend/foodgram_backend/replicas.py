@@ -0,0 +1,157 @@
+"""
+Чтение с реплик базы.
+
+ReplicaMiddleware отмечает запросы безопасными методами (GET, HEAD,
+OPTIONS), и ReplicaRouter направляет чтение в них на одну из реплик
+DB_REPLICAS, выбранную на весь запрос. Запись, чтение в запросах
+другими методами и вне запросов (воркеры, команды) идут в основную
+базу. Токены и сессии читаются только из основной базы, чтобы только
+что выданный токен и вход в админку сразу работали.
+
+Клиент, который что-то записал, следующие DB_PRIMARY_STICKY_SECONDS
+секунд читает из основной базы и видит свои изменения, даже если
+реплика отстаёт. Клиент определяется по заголовку Authorization и по
+cookie сессии (админка, browsable API), в том числе по новой cookie
+после входа, а отметка хранится в кеше (он должен быть общим для
+воркеров).
+"""
+
+import hashlib
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Модели, которые читаются только из основной базы.
+PRIMARY_MODELS = ('authtoken.Token', 'sessions.Session')
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class RequestState:
+    """Реплика для чтения в текущем запросе и была ли в нём запись."""
+
+    def __init__(self, replica):
+        """Состояние запроса; replica=None - чтение из основной базы."""
+        self.replica = replica
+        self.wrote = False
+
+
+current = ContextVar('replica_request_state', default=None)
+
+
+def get_sticky_key(credentials):
+    """Ключ кеша отметки о записи клиента с данными входа credentials."""
+    return 'db-primary:' + hashlib.sha256(credentials.encode()).hexdigest()
+
+
+def get_sticky_keys(request, response=None):
+    """Ключи кеша отметки о записи клиента; пустой список для анонимов.
+
+    Клиент - заголовок Authorization и cookie сессии запроса, а если
+    передан ответ - и новая cookie сессии из него.
+    """
+    credentials = [
+        request.headers.get('Authorization'),
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME),
+    ]
+    if response is not None and settings.SESSION_COOKIE_NAME in (
+        response.cookies
+    ):
+        credentials.append(
+            response.cookies[settings.SESSION_COOKIE_NAME].value
+        )
+    return [get_sticky_key(value) for value in credentials if value]
+
+
+def get_state(request, sticky):
+    """Состояние запроса: реплика, если метод безопасный и отметки нет."""
+    if request.method not in SAFE_METHODS or sticky:
+        return RequestState(None)
+    return RequestState(random.choice(settings.DB_REPLICAS))
+
+
+class ReplicaMiddleware:
+    """Выбор базы для чтения в запросе и отметка клиента после записи."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """Middleware для синхронной и асинхронной цепочки."""
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """Запрос с выбранной базой для чтения."""
+        if self.async_mode:
+            return self.__acall__(request)
+        keys = get_sticky_keys(request)
+        state = get_state(request, keys and cache.get_many(keys))
+        token = current.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        if state.wrote:
+            cache.set_many(
+                dict.fromkeys(get_sticky_keys(request, response), True),
+                settings.DB_PRIMARY_STICKY_SECONDS
+            )
+        return response
+
+    async def __acall__(self, request):
+        """Запрос с выбранной базой для чтения, асинхронно."""
+        keys = get_sticky_keys(request)
+        state = get_state(request, keys and await cache.aget_many(keys))
+        token = current.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        if state.wrote:
+            await cache.aset_many(
+                dict.fromkeys(get_sticky_keys(request, response), True),
+                settings.DB_PRIMARY_STICKY_SECONDS
+            )
+        return response
+
+
+class ReplicaRouter:
+    """Чтение на реплику запроса, запись и миграции в основную базу."""
+
+    def db_for_read(self, model, **hints):
+        """Реплика запроса или None (основная база)."""
+        state = current.get()
+        if (
+            state is None or state.replica is None
+            or model._meta.label in PRIMARY_MODELS
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return None
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        """Основная база; дальше запрос и клиент читают из неё."""
+        state = current.get()
+        if state is not None:
+            state.wrote = True
+            state.replica = None
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Связи между объектами основной базы и реплик разрешены."""
+        databases = {DEFAULT_DB_ALIAS, *settings.DB_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Реплики получают схему из основной базы, не миграциями."""
+        if db in settings.DB_REPLICAS:
+            return False
+        return None
@@ -19,6 +19,21 @@ ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', '*').split(' ')
 
 PATH_FOR_CSV = 'data/'
 
+# Файл снимка продуктов; по умолчанию свой для базы во временном каталоге.
+INGREDIENTS_INDEX_PATH = os.getenv('INGREDIENTS_INDEX_PATH')
+
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+# Наибольший размер изображения в multipart/form-data, байт.
+IMAGE_UPLOAD_MAX_SIZE = int(
+    os.getenv('IMAGE_UPLOAD_MAX_SIZE', 10 * 1024 * 1024)
+)
+# Асинхронные представления чтения (api.async_views), включаются в asgi.py.
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', 'False') == 'True'
+# Basic-аутентификация в API: хеширование пароля на каждый запрос.
+API_BASIC_AUTH = os.getenv('API_BASIC_AUTH', 'True') == 'True'
+# Кеш токенов для аутентификации (recipes.tokens), только с общим кешем.
+TOKEN_CACHE = os.getenv('TOKEN_CACHE', 'False') == 'True'
+
 INSTALLED_APPS = [
     'django.contrib.admin',
     'django.contrib.auth',
@@ -100,14 +115,71 @@ WSGI_APPLICATION = 'foodgram_backend.wsgi.application'
 #         }
 #     }
 
+# Пул соединений с базой в каждом процессе (foodgram_backend.postgresql):
+# соединение возвращается в пул в конце запроса. Без пула соединение
+# живёт DB_CONN_MAX_AGE секунд.
+DB_POOL = os.getenv('DB_POOL', 'False') == 'True'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': (
+            'foodgram_backend.postgresql' if DB_POOL
+            else 'django.db.backends.postgresql'
+        ),
         'NAME': os.getenv('POSTGRES_DB', 'django'),
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'django'),
         'HOST': os.getenv('DB_HOST', ''),
         'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': (
+            0 if DB_POOL else int(os.getenv('DB_CONN_MAX_AGE', 0))
+        ),
+        'CONN_HEALTH_CHECKS': (
+            os.getenv('DB_CONN_HEALTH_CHECKS', 'False') == 'True'
+        ),
+        'OPTIONS': {
+            'pool': {
+                'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+                'timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+                'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', 300)),
+                'max_lifetime': float(
+                    os.getenv('DB_POOL_MAX_LIFETIME', 3600)
+                ),
+                'check': os.getenv('DB_POOL_CHECK', 'True') == 'True',
+            },
+        } if DB_POOL else {},
+    }
+}
+
+# Реплики для чтения (foodgram_backend.replicas): хост[:порт] через пробел,
+# база, пользователь и пароль - как у основной. Клиент, записавший данные,
+# DB_PRIMARY_STICKY_SECONDS секунд читает из основной базы.
+DB_REPLICAS = []
+for number, address in enumerate(
+    os.getenv('DB_REPLICA_HOSTS', '').split(), 1
+):
+    host, _, port = address.partition(':')
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DB_REPLICAS.append(f'replica_{number}')
+DB_PRIMARY_STICKY_SECONDS = int(os.getenv('DB_PRIMARY_STICKY_SECONDS', 5))
+if DB_REPLICAS:
+    DATABASE_ROUTERS = ['foodgram_backend.replicas.ReplicaRouter']
+    MIDDLEWARE.insert(1, 'foodgram_backend.replicas.ReplicaMiddleware')
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodgram'),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 5000)),
+        },
     }
 }
 
@@ -131,8 +203,10 @@ EMAIL_FILE_PATH = BASE_DIR / 'sent_emails'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
+        'api.authentication.CachedTokenAuthentication',
+    ) + (
+        ('rest_framework.authentication.BasicAuthentication',)
+        if API_BASIC_AUTH else ()
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 6,
@@ -154,4 +228,14 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Медиафайлы хранятся под именами по содержимому (recipes.storage).
+STORAGES = {
+    'default': {
+        'BACKEND': 'recipes.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -0,0 +1,119 @@
+"""Пул соединений с PostgreSQL (foodgram_backend.postgresql.pool)."""
+
+import threading
+import time
+
+import psycopg2
+import pytest
+from django.db import connection
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+from foodgram_backend.postgresql.pool import ConnectionPool, PoolTimeout
+
+pytestmark = pytest.mark.skipif(
+    connection.vendor != 'postgresql', reason='Пул только для PostgreSQL'
+)
+
+
+@pytest.fixture
+def make_pool(db):
+    """Создание пула тестовой базы; соединения закрываются после теста."""
+    opened = []
+
+    def connect():
+        opened.append(psycopg2.connect(**connection.get_connection_params()))
+        return opened[-1]
+
+    def make(max_size=2, timeout=5.0):
+        pool = ConnectionPool(
+            max_size=max_size, timeout=timeout, max_idle=300.0,
+            max_lifetime=3600.0, check=True
+        )
+        return pool, connect
+
+    yield make
+    for opened_connection in opened:
+        opened_connection.close()
+
+
+@pytest.mark.parametrize('sql', ('SELECT 1', 'SELECT 1 / 0'))
+def test_release_after_error(sql, make_pool):
+    """Соединение с открытой или прерванной транзакцией откатывается.
+
+    В пул оно возвращается готовым к работе и выдаётся снова.
+    """
+    pool, connect = make_pool()
+    first = pool.acquire(connect)
+    try:
+        with first.cursor() as cursor:
+            cursor.execute(sql)
+    except psycopg2.DataError:
+        pass
+    assert first.info.transaction_status != TRANSACTION_STATUS_IDLE
+    pool.release(first)
+    second = pool.acquire(connect)
+    assert second is first
+    assert second.info.transaction_status == TRANSACTION_STATUS_IDLE
+    with second.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        assert cursor.fetchone() == (1,)
+    assert pool.stats()['opened'] == 1
+
+
+def test_release_broken(make_pool):
+    """Соединение, закрытое сервером, не возвращается в пул."""
+    pool, connect = make_pool()
+    first = pool.acquire(connect)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_terminate_backend(%s)', [first.get_backend_pid()]
+        )
+    with pytest.raises(psycopg2.OperationalError):
+        with first.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    pool.release(first)
+    assert first.closed
+    second = pool.acquire(connect)
+    assert second is not first
+    stats = pool.stats()
+    assert (stats['opened'], stats['closed'], stats['in_use']) == (2, 1, 1)
+
+
+def test_exhausted_timeout(make_pool):
+    """Без свободных соединений выдача ждёт timeout и падает."""
+    pool, connect = make_pool(max_size=1, timeout=0.2)
+    pool.acquire(connect)
+    start = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.acquire(connect)
+    assert time.monotonic() - start >= 0.2
+    stats = pool.stats()
+    assert (stats['timeouts'], stats['in_use'], stats['opened']) == (1, 1, 1)
+
+
+def test_exhausted_wait(make_pool):
+    """Ожидающий запрос получает соединение, возвращённое в пул."""
+    pool, connect = make_pool(max_size=1)
+    first = pool.acquire(connect)
+    timer = threading.Timer(0.2, pool.release, [first])
+    timer.start()
+    try:
+        assert pool.acquire(connect) is first
+    finally:
+        timer.join()
+    stats = pool.stats()
+    assert (stats['waits'], stats['opened']) == (1, 1)
+    assert stats['max_wait'] >= 0.1
+
+
+def test_failed_connect(make_pool):
+    """Ошибка открытия соединения освобождает место в пуле."""
+    pool, connect = make_pool(max_size=1, timeout=0.2)
+
+    def fail():
+        raise psycopg2.OperationalError('нет соединения')
+
+    with pytest.raises(psycopg2.OperationalError):
+        pool.acquire(fail)
+    assert pool.acquire(connect) is not None
+    assert pool.stats()['in_use'] == 1
@@ -0,0 +1,103 @@
+"""Выбор базы для чтения (foodgram_backend.replicas)."""
+
+import asyncio
+
+import pytest
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from foodgram_backend.replicas import ReplicaMiddleware, ReplicaRouter
+from recipes.models import Recipe
+
+REPLICA = 'replica_1'
+router = ReplicaRouter()
+
+
+@pytest.fixture(autouse=True)
+def replicas(settings):
+    """Одна реплика в настройках."""
+    settings.DB_REPLICAS = [REPLICA]
+    settings.DB_PRIMARY_STICKY_SECONDS = 5
+
+
+def handle(
+    method='get', write=False, cookie=None, new_cookie=None, **headers
+):
+    """База для чтения рецептов в запросе через ReplicaMiddleware."""
+    databases = {}
+
+    def view(request):
+        if write:
+            router.db_for_write(Recipe)
+        databases['read'] = router.db_for_read(Recipe)
+        databases['session'] = router.db_for_read(Session)
+        response = HttpResponse()
+        if new_cookie:
+            response.set_cookie(settings.SESSION_COOKIE_NAME, new_cookie)
+        return response
+
+    request = getattr(RequestFactory(), method)('/', **headers)
+    if cookie:
+        request.COOKIES[settings.SESSION_COOKIE_NAME] = cookie
+    ReplicaMiddleware(view)(request)
+    return databases
+
+
+def test_safe_methods_read_from_replica():
+    """GET читает с реплики, POST - из основной базы."""
+    assert handle()['read'] == REPLICA
+    assert handle('post')['read'] is None
+
+
+def test_outside_requests_and_primary_models():
+    """Вне запроса и для сессий - основная база."""
+    assert router.db_for_read(Recipe) is None
+    assert handle()['session'] is None
+
+
+def test_read_after_write_in_request():
+    """После записи запрос читает из основной базы."""
+    assert handle('get', write=True)['read'] is None
+
+
+def test_token_client_sticky():
+    """Клиент с токеном после записи читает из основной базы."""
+    handle('post', write=True, HTTP_AUTHORIZATION='Token first')
+    assert handle(HTTP_AUTHORIZATION='Token first')['read'] is None
+    assert handle(HTTP_AUTHORIZATION='Token second')['read'] == REPLICA
+    assert handle()['read'] == REPLICA
+
+
+def test_session_client_sticky():
+    """Клиент с сессией после записи читает из основной базы."""
+    handle('post', write=True, cookie='first')
+    assert handle(cookie='first')['read'] is None
+    assert handle(cookie='second')['read'] == REPLICA
+
+
+def test_new_session_after_login_sticky():
+    """Новая cookie сессии после входа отмечается сразу."""
+    handle('post', write=True, new_cookie='logged-in')
+    assert handle(cookie='logged-in')['read'] is None
+
+
+def test_async_token_client_sticky():
+    """Асинхронная цепочка отмечает клиента так же."""
+    databases = {}
+
+    async def view(request):
+        if request.method == 'POST':
+            router.db_for_write(Recipe)
+        databases[request.method] = router.db_for_read(Recipe)
+        return HttpResponse()
+
+    async def run():
+        middleware = ReplicaMiddleware(view)
+        factory = RequestFactory()
+        await middleware(factory.post('/', HTTP_AUTHORIZATION='Token async'))
+        await middleware(factory.get('/', HTTP_AUTHORIZATION='Token async'))
+
+    asyncio.run(run())
+    assert databases == {'POST': None, 'GET': None}
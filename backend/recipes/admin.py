@@ -1,13 +1,21 @@
 """Настройка админки."""
 
+from contextlib import ExitStack
+
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import Group
-from django.db.models import Max, Min
+from django.core.cache import cache
+from django.db.models import Count, Prefetch
 from django.utils.safestring import mark_safe
 
+from recipes.constants import (COOKING_TIME_BUCKETS,
+                               COOKING_TIME_HISTOGRAM_KEY,
+                               COOKING_TIME_HISTOGRAM_TIMEOUT)
 from recipes.models import (DBUser, Favorites, Ingredient, Recipe,
                             RecipeIngredient, ShoppingCart, Subscriptions, Tag)
+from recipes.shopping_list import recipe_ingredients_changed
 
 admin.site.empty_value_display = 'Не задано'
 
@@ -17,10 +25,16 @@ admin.site.unregister(Group)
 class CountRecipesMixin:
     """Миксин счёта рецептов."""
 
-    @admin.display(description='Рецепты')
+    def get_queryset(self, request):
+        """Количество рецептов считается в запросе списка."""
+        return super().get_queryset(request).annotate(
+            recipes_count=Count('recipes')
+        )
+
+    @admin.display(description='Рецепты', ordering='recipes_count')
     def get_count_in_recipes(self, obj):
         """Количество рецептов."""
-        return obj.recipes.count()
+        return obj.recipes_count
 
 
 @admin.register(Ingredient)
@@ -43,52 +57,93 @@ class TagAdmin(CountRecipesMixin, admin.ModelAdmin):
 
 
 class CookingTimeFilter(admin.SimpleListFilter):
-    """Фильтр по времени готовки."""
+    """Фильтр по времени готовки.
+
+    Диапазон от самого быстрого до самого долгого рецепта делится на
+    buckets равных частей. Число частей берётся из атрибута
+    cooking_time_buckets админки модели, а если его нет - из
+    COOKING_TIME_BUCKETS. Количество рецептов для каждого времени
+    готовки считается одним запросом с GROUP BY и хранится в кеше
+    (сбрасывается при сохранении и удалении рецептов), а границы и
+    количество рецептов в частях считаются по нему.
+    """
 
     title = 'Время готовки'
     parameter_name = 'cooking_time'
 
-    def get_recipes(self, period_key, recipes=None):
-        """Объекты за период."""
-        if recipes is None:
-            recipes = self.recipes
-        return recipes.filter(
-            cooking_time__range=self.periods.get(period_key)
+    def __init__(self, request, params, model, model_admin):
+        """Число частей из админки модели."""
+        self.buckets = getattr(
+            model_admin, 'cooking_time_buckets', COOKING_TIME_BUCKETS
         )
+        super().__init__(request, params, model, model_admin)
+
+    def get_histogram(self, model):
+        """Количество рецептов для каждого времени готовки."""
+        histogram = cache.get(COOKING_TIME_HISTOGRAM_KEY)
+        if histogram is None:
+            histogram = list(model.objects.values_list(
+                'cooking_time'
+            ).annotate(count=Count('pk')).order_by('cooking_time'))
+            cache.set(
+                COOKING_TIME_HISTOGRAM_KEY,
+                histogram,
+                COOKING_TIME_HISTOGRAM_TIMEOUT
+            )
+        return histogram
+
+    def get_periods(self, histogram):
+        """Границы частей и количество рецептов в них."""
+        min_cooking_time = histogram[0][0]
+        max_cooking_time = histogram[-1][0]
+        bounds = sorted({
+            min_cooking_time
+            + (max_cooking_time - min_cooking_time) * part // self.buckets
+            for part in range(1, self.buckets)
+        })
+        periods = []
+        start = 0
+        for bound in bounds:
+            periods.append([start, bound, 0])
+            start = bound + 1
+        periods.append([start, None, 0])
+        part = 0
+        for cooking_time, count in histogram:
+            while periods[part][1] is not None and (
+                cooking_time > periods[part][1]
+            ):
+                part += 1
+            periods[part][2] += count
+        return periods
 
     def lookups(self, request, model_admin):
         """Параметры фильтра."""
-        cooking_times = model_admin.model.objects.aggregate(
-            Min('cooking_time'), Max('cooking_time')
-        )
-        min_cooking_time = cooking_times['cooking_time__min']
-        max_cooking_time = cooking_times['cooking_time__max']
-        if min_cooking_time == max_cooking_time:
+        histogram = self.get_histogram(model_admin.model)
+        if len(histogram) < 2:
             return []
-        delta = (max_cooking_time - min_cooking_time) // 3
-        quickly_time = min_cooking_time + delta
-        long_time = max_cooking_time - delta
-        self.periods = {
-            'quickly': (0, quickly_time),
-            'medium': (quickly_time + 1, long_time),
-            'long': (long_time + 1, 10**10),
-        }
-        self.recipes = model_admin.model.objects
-        count_quickly_recipes = self.get_recipes('quickly').count()
-        count_medium_recipes = self.get_recipes('medium').count()
-        count_long_recipes = self.get_recipes('long').count()
         return [
-            ('quickly',
-             f'Быстрее {quickly_time} мин ({count_quickly_recipes})'),
-            ('medium', f'Быстрее {long_time} мин ({count_medium_recipes})'),
-            ('long', f'Долго ({count_long_recipes})'),
+            (
+                f'{start}-{end}' if end is not None else f'{start}-',
+                f'Быстрее {end} мин ({count})' if end is not None
+                else f'Долго ({count})'
+            )
+            for start, end, count in self.get_periods(histogram)
         ]
 
     def queryset(self, request, recipes):
         """Рецепты по времени готовки."""
         params = self.value()
-        if params:
-            return self.get_recipes(params, recipes)
+        if not params:
+            return recipes
+        start, _, end = params.partition('-')
+        try:
+            recipes = recipes.filter(cooking_time__gte=int(start))
+            if end:
+                recipes = recipes.filter(cooking_time__lte=int(end))
+        except ValueError:
+            raise IncorrectLookupParameters(
+                f'Неверный диапазон времени готовки: {params}.'
+            )
         return recipes
 
 
@@ -113,6 +168,24 @@ class RecipeAdmin(admin.ModelAdmin):
     list_display_links = ('name',)
     filter_horizontal = ('tags',)
     inlines = (RecipeIngredientInline,)
+    cooking_time_buckets = COOKING_TIME_BUCKETS
+
+    def get_queryset(self, request):
+        """Автор, теги и продукты загружаются для всей страницы сразу."""
+        return super().get_queryset(request).select_related(
+            'author'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'recipeingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        )
+
+    def save_related(self, request, form, formsets, change):
+        """Сохранение продуктов с обновлением списков покупок."""
+        with recipe_ingredients_changed(form.instance):
+            super().save_related(request, form, formsets, change)
 
     @admin.display(description='Тег(и)')
     @mark_safe
@@ -120,10 +193,10 @@ class RecipeAdmin(admin.ModelAdmin):
         """Отображение тегов рецепта."""
         return '<br>'.join(tag.name for tag in recipe.tags.all())
 
-    @admin.display(description='В избранном')
+    @admin.display(description='В избранном', ordering='favorites_count')
     def get_favorited_count(self, recipe):
         """Количество добавления рецепта в избранне."""
-        return recipe.is_favorited.count()
+        return recipe.favorites_count
 
     @admin.display(description='Продукт(ы)')
     @mark_safe
@@ -151,6 +224,39 @@ class RecipeIngredientAdmin(admin.ModelAdmin):
 
     list_display = ('recipe', 'ingredient', 'amount')
 
+    def get_queryset(self, request):
+        """Рецепты и продукты загружаются в запросе списка."""
+        return super().get_queryset(request).select_related(
+            'recipe', 'ingredient'
+        )
+
+    def ingredients_changed(self, recipes):
+        """Изменение продуктов рецептов с обновлением списков покупок."""
+        stack = ExitStack()
+        for recipe in sorted(set(recipes)):
+            stack.enter_context(recipe_ingredients_changed(recipe))
+        return stack
+
+    def save_model(self, request, obj, form, change):
+        """Сохранение; меняются списки покупок старого и нового рецепта."""
+        recipes = [obj.recipe_id]
+        if change and 'recipe' in form.changed_data:
+            recipes.append(form.initial['recipe'])
+        with self.ingredients_changed(recipes):
+            super().save_model(request, obj, form, change)
+
+    def delete_model(self, request, obj):
+        """Удаление с обновлением списков покупок."""
+        with self.ingredients_changed([obj.recipe_id]):
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        """Удаление выбранных с обновлением списков покупок."""
+        with self.ingredients_changed(
+            queryset.values_list('recipe', flat=True)
+        ):
+            super().delete_queryset(request, queryset)
+
 
 class BaseFilter(admin.SimpleListFilter):
     """Базовый фильтр."""
@@ -188,8 +294,8 @@ class RecipesFilter(BaseFilter):
         ('False', 'Нет рецептов'),
     ]
     queryset_params = {
-        'True': {'recipes__isnull': False},
-        'False': {'recipes__isnull': True},
+        'True': {'recipes_count__gt': 0},
+        'False': {'recipes_count': 0},
     }
 
 
@@ -203,8 +309,8 @@ class SubscribersFilter(BaseFilter):
         ('False', 'Нет подписчиков'),
     ]
     queryset_params = {
-        'True': {'authors__isnull': False},
-        'False': {'authors__isnull': True},
+        'True': {'subscribers_count__gt': 0},
+        'False': {'subscribers_count': 0},
     }
 
 
@@ -218,13 +324,13 @@ class SubscriptionsFilter(BaseFilter):
         ('False', 'Нет подписок'),
     ]
     queryset_params = {
-        'True': {'subscribers__isnull': False},
-        'False': {'subscribers__isnull': True},
+        'True': {'subscriptions_count__gt': 0},
+        'False': {'subscriptions_count': 0},
     }
 
 
 @admin.register(DBUser)
-class UserAdmin(CountRecipesMixin, BaseUserAdmin):
+class UserAdmin(BaseUserAdmin):
     """Пользователи."""
 
     fieldsets = (
@@ -258,15 +364,20 @@ class UserAdmin(CountRecipesMixin, BaseUserAdmin):
             return f'<img src="{user.avatar.url}" style="max-height: 80px;">'
         return None
 
-    @admin.display(description='Подписки')
+    @admin.display(description='Рецепты', ordering='recipes_count')
+    def get_count_in_recipes(self, user):
+        """Количество рецептов."""
+        return user.recipes_count
+
+    @admin.display(description='Подписки', ordering='subscriptions_count')
     def get_subscriptions_count(self, user):
         """Количество подписок."""
-        return user.subscribers.count()
+        return user.subscriptions_count
 
-    @admin.display(description='Подписчиков')
+    @admin.display(description='Подписчиков', ordering='subscribers_count')
     def get_subscribers_count(self, user):
         """Количество подписчиков."""
-        return user.authors.count()
+        return user.subscribers_count
 
 
 @admin.register(Subscriptions)
@@ -276,6 +387,12 @@ class SubscriptionsAdmin(admin.ModelAdmin):
     list_display = ('subscriber', 'author')
     search_fields = ('subscriber', 'author')
 
+    def get_queryset(self, request):
+        """Подписчик и автор загружаются в запросе списка."""
+        return super().get_queryset(request).select_related(
+            'subscriber', 'author'
+        )
+
 
 @admin.register(Favorites, ShoppingCart)
 class DefaultAdmin(admin.ModelAdmin):
@@ -283,3 +400,7 @@ class DefaultAdmin(admin.ModelAdmin):
 
     list_display = ('user', 'recipe')
     search_fields = ('user', 'recipe')
+
+    def get_queryset(self, request):
+        """Пользователь и рецепт загружаются в запросе списка."""
+        return super().get_queryset(request).select_related('user', 'recipe')
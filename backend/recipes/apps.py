@@ -9,3 +9,8 @@ class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
     verbose_name = 'Рецепты'
+
+    def ready(self):
+        """Подключение сигналов и проверок."""
+        import recipes.checks  # noqa: F401
+        import recipes.signals  # noqa: F401
@@ -0,0 +1,436 @@
+"""
+Потоковая загрузка справочников (продукты, теги) из CSV и JSON.
+
+Строки читаются и проверяются частями по chunk_size, поэтому память не
+зависит от размера файла. В PostgreSQL часть копируется через COPY во
+временную таблицу и переносится в справочник одним
+INSERT ... ON CONFLICT DO NOTHING, в остальных базах записывается через
+bulk_create после поиска уже существующих записей одним запросом.
+
+В режиме синхронизации (sync) хеш каждой строки сравнивается с
+отпечатком справочника: ключ записи (CATALOGUES) -> id и хеш значений.
+Записываются только новые и изменённые строки, а записи, которых нет
+в файле, по желанию удаляются.
+"""
+
+import csv
+import hashlib
+import io
+import json
+import time
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import Q, UniqueConstraint
+from django.utils import timezone
+
+from recipes.models import Ingredient, Recipe, Tag
+
+# Модель, поля в порядке столбцов файла и ключ записи для синхронизации.
+CATALOGUES = {
+    'ingredients': (
+        Ingredient, ('name', 'measurement_unit'), ('name', 'measurement_unit')
+    ),
+    'tags': (Tag, ('name', 'slug'), ('slug',)),
+}
+READ_SIZE = 64 * 1024
+
+
+def read_csv(file, fields):
+    """Номера и строки CSV; строка заголовка пропускается."""
+    for number, row in enumerate(csv.reader(file), 1):
+        if number == 1 and row == list(fields):
+            continue
+        yield number, row
+
+
+def read_json(file):
+    """Номера и элементы массива JSON без чтения всего файла."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    eof = False
+
+    def fill():
+        nonlocal buffer, eof
+        data = file.read(READ_SIZE)
+        eof = not data
+        buffer += data
+
+    def skip(expected):
+        nonlocal buffer
+        buffer = buffer.lstrip()
+        while not buffer and not eof:
+            fill()
+            buffer = buffer.lstrip()
+        if buffer[:1] not in expected:
+            raise ValueError(
+                f'Ожидается один из символов {expected!r} в массиве JSON.'
+            )
+        found = buffer[0]
+        buffer = buffer[1:]
+        return found
+
+    skip('[')
+    number = 0
+    buffer = buffer.lstrip()
+    if buffer.startswith(']'):
+        return
+    while True:
+        buffer = buffer.lstrip()
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            fill()
+            continue
+        if end == len(buffer) and not eof:
+            fill()
+            continue
+        number += 1
+        yield number, item
+        buffer = buffer[end:]
+        if skip(',]') == ']':
+            return
+
+
+def read_rows(path, file, fields):
+    """Номера и строки файла по его расширению."""
+    if path.endswith('.json'):
+        return read_json(file)
+    return read_csv(file, fields)
+
+
+def get_hash(values):
+    """Хеш значений полей строки."""
+    return hashlib.blake2b(
+        json.dumps(values, ensure_ascii=False).encode(), digest_size=8
+    ).digest()
+
+
+def get_unique_keys(model, fields):
+    """Наборы полей, значения которых в справочнике уникальны."""
+    keys = [
+        (name,) for name in fields if model._meta.get_field(name).unique
+    ]
+    keys += [
+        tuple(constraint.fields) for constraint in model._meta.constraints
+        if isinstance(constraint, UniqueConstraint)
+        and constraint.condition is None
+        and constraint.fields and set(constraint.fields) <= set(fields)
+    ]
+    return keys
+
+
+class ImportStats:
+    """Итоги загрузки."""
+
+    def __init__(self):
+        """Пустые счётчики."""
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.deleted = 0
+        self.kept = 0
+        self.skipped = 0
+        self.failed = 0
+        self.errors = []
+        self.started = time.monotonic()
+
+    @property
+    def processed(self):
+        """Обработано строк."""
+        return (
+            self.inserted + self.updated + self.unchanged
+            + self.skipped + self.failed
+        )
+
+    @property
+    def elapsed(self):
+        """Секунд с начала загрузки."""
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self):
+        """Строк в секунду."""
+        return self.processed / max(self.elapsed, 1e-6)
+
+
+class CatalogueLoader:
+    """Загрузка строк в справочник частями."""
+
+    def __init__(self, model, fields, chunk_size, method='auto', key=None):
+        """Справочник, его поля в порядке столбцов и способ записи.
+
+        key - поля ключа записи для синхронизации.
+        """
+        self.model = model
+        self.fields = tuple(fields)
+        self.key = tuple(key or fields)
+        self.chunk_size = chunk_size
+        if method == 'auto':
+            method = 'copy' if connection.vendor == 'postgresql' else 'bulk'
+        if method == 'copy' and connection.vendor != 'postgresql':
+            raise ValueError('COPY доступен только в PostgreSQL.')
+        self.method = method
+        self.unique_keys = get_unique_keys(model, self.fields)
+
+    def clean(self, row):
+        """Значения полей строки; ValidationError при ошибках."""
+        if isinstance(row, dict):
+            missing = [name for name in self.fields if name not in row]
+            if missing:
+                raise ValidationError(
+                    f'Нет полей: {", ".join(missing)}.'
+                )
+            row = [row[name] for name in self.fields]
+        elif not isinstance(row, list) or len(row) != len(self.fields):
+            raise ValidationError(
+                f'Ожидается {len(self.fields)} значения: '
+                f'{", ".join(self.fields)}.'
+            )
+        return tuple(
+            self.model._meta.get_field(name).clean(
+                value.strip() if isinstance(value, str) else value, None
+            )
+            for name, value in zip(self.fields, row)
+        )
+
+    def get_chunks(self, rows, stats):
+        """Части проверенных строк (номер, значения); ошибки в stats."""
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                return
+            values = []
+            for number, row in chunk:
+                try:
+                    values.append((number, self.clean(row)))
+                except ValidationError as error:
+                    stats.failed += 1
+                    stats.errors.append((number, ' '.join(error.messages)))
+            yield values
+
+    def insert(self, values):
+        """Запись новых строк; возвращает число добавленных."""
+        if self.method == 'copy':
+            return self.insert_copy(values)
+        return self.insert_bulk(values)
+
+    def load(self, rows, progress=None):
+        """Загрузка строк (номер, строка); progress(stats) после частей."""
+        stats = ImportStats()
+        try:
+            if self.method == 'copy':
+                self.create_staging()
+            for chunk in self.get_chunks(rows, stats):
+                if chunk:
+                    with transaction.atomic():
+                        inserted = self.insert(
+                            [values for _, values in chunk]
+                        )
+                    stats.inserted += inserted
+                    stats.skipped += len(chunk) - inserted
+                if progress:
+                    progress(stats)
+        finally:
+            if self.method == 'copy':
+                self.drop_staging()
+        return stats
+
+    def get_key(self, values):
+        """Ключ записи по значениям её полей."""
+        return tuple(values[self.fields.index(name)] for name in self.key)
+
+    def get_fingerprint(self):
+        """Ключ -> (id, хеш значений) для всех записей справочника."""
+        return {
+            self.get_key(values): (pk, get_hash(values))
+            for pk, *values in self.model.objects.values_list(
+                'pk', *self.fields
+            ).iterator()
+        }
+
+    def sync(self, rows, delete=False, dry_run=False, progress=None):
+        """Синхронизация справочника со строками файла.
+
+        Добавляются новые ключи, изменяются записи с другим хешем, а
+        с delete удаляются записи, ключей которых нет в файле и которые
+        не используются в рецептах. С dry_run только считается, что
+        будет сделано. Повторы ключа в файле пропускаются.
+        """
+        stats = ImportStats()
+        fingerprint = self.get_fingerprint()
+        seen = set()
+        try:
+            if self.method == 'copy' and not dry_run:
+                self.create_staging()
+            for chunk in self.get_chunks(rows, stats):
+                new = []
+                changed = []
+                for _, values in chunk:
+                    key = self.get_key(values)
+                    if key in seen:
+                        stats.skipped += 1
+                        continue
+                    seen.add(key)
+                    current = fingerprint.get(key)
+                    if current is None:
+                        new.append(values)
+                    elif current[1] != get_hash(values):
+                        changed.append((current[0], values))
+                    else:
+                        stats.unchanged += 1
+                if dry_run:
+                    stats.inserted += len(new)
+                    stats.updated += len(changed)
+                elif new or changed:
+                    with transaction.atomic():
+                        inserted = self.insert(new) if new else 0
+                        self.update(changed)
+                    stats.inserted += inserted
+                    stats.skipped += len(new) - inserted
+                    stats.updated += len(changed)
+                if progress:
+                    progress(stats)
+        finally:
+            if self.method == 'copy' and not dry_run:
+                self.drop_staging()
+        if delete:
+            missing = iter([
+                pk for key, (pk, _) in fingerprint.items() if key not in seen
+            ])
+            while True:
+                pks = list(islice(missing, self.chunk_size))
+                if not pks:
+                    break
+                unused = self.model.objects.filter(
+                    pk__in=pks, recipes__isnull=True
+                )
+                deleted = unused.count()
+                stats.deleted += deleted
+                stats.kept += len(pks) - deleted
+                if not dry_run and deleted:
+                    unused.delete()
+        return stats
+
+    def update(self, changed):
+        """Запись изменённых строк (id, значения).
+
+        bulk_update не вызывает сигналы, поэтому дата изменения
+        рецептов с этими записями обновляется здесь.
+        """
+        if not changed:
+            return
+        now = timezone.now()
+        timestamps = [
+            field.name for field in self.model._meta.concrete_fields
+            if getattr(field, 'auto_now', False)
+        ]
+        self.model.objects.bulk_update(
+            [
+                self.model(
+                    pk=pk,
+                    **dict(zip(self.fields, values)),
+                    **{name: now for name in timestamps}
+                )
+                for pk, values in changed
+            ],
+            [name for name in self.fields if name not in self.key]
+            + timestamps
+        )
+        relation = self.model._meta.get_field('recipes').field.name
+        Recipe.objects.filter(**{
+            f'{relation}__in': [pk for pk, _ in changed]
+        }).update(updated_at=now)
+
+    def get_key_values(self, row):
+        """Значения уникальных наборов полей строки."""
+        return [
+            tuple(row[self.fields.index(name)] for name in key)
+            for key in self.unique_keys
+        ]
+
+    def insert_bulk(self, values):
+        """Запись части через bulk_create; возвращает число новых строк."""
+        query = Q()
+        for key in self.unique_keys:
+            index = self.fields.index(key[0])
+            query |= Q(**{f'{key[0]}__in': {row[index] for row in values}})
+        taken = [set() for _ in self.unique_keys]
+        if self.unique_keys:
+            for row in self.model.objects.filter(query).values_list(
+                *self.fields
+            ).iterator():
+                for seen, key_values in zip(taken, self.get_key_values(row)):
+                    seen.add(key_values)
+        new = []
+        for row in values:
+            key_values = self.get_key_values(row)
+            if any(value in seen for seen, value in zip(taken, key_values)):
+                continue
+            for seen, value in zip(taken, key_values):
+                seen.add(value)
+            new.append(self.model(**dict(zip(self.fields, row))))
+        self.model.objects.bulk_create(new, ignore_conflicts=True)
+        return len(new)
+
+    @property
+    def staging_table(self):
+        """Временная таблица для COPY."""
+        return connection.ops.quote_name(f'{self.model._meta.db_table}_import')
+
+    def create_staging(self):
+        """Создание временной таблицы для COPY."""
+        columns = ', '.join(
+            f'{connection.ops.quote_name(self.get_column(name))} text'
+            for name in self.fields
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {self.staging_table}')
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE {self.staging_table} ({columns})'
+            )
+
+    def drop_staging(self):
+        """Удаление временной таблицы."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {self.staging_table}')
+
+    def get_column(self, name):
+        """Столбец поля справочника."""
+        return self.model._meta.get_field(name).column
+
+    def insert_copy(self, values):
+        """Запись части через COPY; возвращает число новых строк."""
+        quote = connection.ops.quote_name
+        columns = [quote(self.get_column(name)) for name in self.fields]
+        timestamps = [
+            quote(field.column) for field in self.model._meta.concrete_fields
+            if getattr(field, 'auto_now', False)
+            or getattr(field, 'auto_now_add', False)
+        ]
+        data = io.StringIO()
+        csv.writer(data).writerows(values)
+        data.seek(0)
+        copy_sql = (
+            f'COPY {self.staging_table} ({", ".join(columns)}) '
+            'FROM STDIN WITH (FORMAT csv)'
+        )
+        insert_sql = (
+            f'INSERT INTO {quote(self.model._meta.db_table)} '
+            f'({", ".join(columns + timestamps)}) '
+            f'SELECT {", ".join(columns + ["now()"] * len(timestamps))} '
+            f'FROM {self.staging_table} ON CONFLICT DO NOTHING'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {self.staging_table}')
+            if hasattr(cursor.cursor, 'copy_expert'):
+                cursor.cursor.copy_expert(copy_sql, data)
+            else:
+                with cursor.cursor.copy(copy_sql) as copy:
+                    copy.write(data.getvalue())
+            cursor.execute(insert_sql)
+            return cursor.rowcount
@@ -0,0 +1,19 @@
+"""Проверки настроек приложения recipes."""
+
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+from recipes.tokens import is_shared_cache
+
+
+@register(Tags.caches)
+def check_token_cache(app_configs, **kwargs):
+    """Кеш токенов включён, а кеш у каждого процесса свой."""
+    if not settings.TOKEN_CACHE or is_shared_cache():
+        return []
+    return [Warning(
+        'TOKEN_CACHE включён, но кеш по умолчанию свой у каждого процесса: '
+        'токены не кешируются.',
+        hint='Укажите общий для воркеров CACHE_BACKEND (Redis, Memcached).',
+        id='recipes.W001',
+    )]
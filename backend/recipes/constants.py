@@ -12,3 +12,20 @@ MAX_LENGTH_FIRST_NAME = 150
 MAX_LENGTH_LAST_NAME = 150
 MAX_LENGTH_USERNAME = 150
 OK_USERNAME = r'[\w.@+-]+'
+COOKING_TIME_BUCKETS = 3
+COOKING_TIME_HISTOGRAM_KEY = 'recipes:cooking_time_histogram'
+COOKING_TIME_HISTOGRAM_TIMEOUT = 5 * 60
+IMPORT_CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 20
+# Алфавит short_url по умолчанию без цифр: 23 буквы, простое число.
+SHORT_LINK_ALPHABET = 'mnjcrvbpygwzhsdaetxukfq'
+SHORT_LINK_MIN_LENGTH = 5
+SHORT_LINK_CACHE_SIZE = 10000
+SHORT_LINK_CACHE_TIMEOUT = 60
+# Время кеширования переадресации в браузерах и nginx, секунд.
+SHORT_LINK_MAX_AGE = 60 * 60
+SHORT_LINK_NOT_FOUND_MAX_AGE = 60
+# Время кеширования токена с пользователем для аутентификации, секунд.
+TOKEN_CACHE_TIMEOUT = 60
+# Как часто воркер сверяет снимок продуктов с базой, секунд.
+INGREDIENTS_INDEX_CHECK_INTERVAL = 60
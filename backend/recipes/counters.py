@@ -0,0 +1,56 @@
+"""
+Счётчики в моделях вместо COUNT(*).
+
+COUNTERS: модель и поле счётчика, модель записей, которые считаются,
+и поле этих записей со ссылкой на объект счётчика. Счётчики меняются
+на 1 через F() при создании и удалении записей (recipes.signals), а
+reconcile исправляет расхождения с фактическим количеством записей.
+"""
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+COUNTERS = (
+    ('recipes.Recipe', 'favorites_count', 'recipes.Favorites', 'recipe'),
+    ('recipes.Recipe', 'in_carts_count', 'recipes.ShoppingCart', 'recipe'),
+    ('recipes.DBUser', 'recipes_count', 'recipes.Recipe', 'author'),
+    ('recipes.DBUser', 'subscribers_count', 'recipes.Subscriptions', 'author'),
+    (
+        'recipes.DBUser', 'subscriptions_count',
+        'recipes.Subscriptions', 'subscriber'
+    ),
+)
+
+
+def change_counter(model, field, pk, delta):
+    """Изменение счётчика объекта на delta одним UPDATE.
+
+    Счётчик не уходит ниже нуля, даже если уже разошёлся с записями.
+    """
+    objects = model.objects.filter(pk=pk)
+    if delta < 0:
+        objects = objects.filter(**{f'{field}__gte': -delta})
+    objects.update(**{field: F(field) + delta})
+
+
+def reconcile(apps):
+    """Исправление счётчиков, не совпадающих с количеством записей.
+
+    apps - реестр моделей (django.apps.apps или apps миграции).
+    Возвращает количество исправленных объектов по каждому счётчику.
+    """
+    fixed = {}
+    for counter_label, field, related_label, related_field in COUNTERS:
+        model = apps.get_model(counter_label)
+        related_model = apps.get_model(related_label)
+        actual = Coalesce(Subquery(
+            related_model.objects.filter(
+                **{related_field: OuterRef('pk')}
+            ).order_by().values(related_field).annotate(
+                count=Count('pk')
+            ).values('count')
+        ), 0)
+        fixed[f'{model.__name__}.{field}'] = model.objects.exclude(
+            **{field: actual}
+        ).update(**{field: actual})
+    return fixed
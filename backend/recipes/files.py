@@ -0,0 +1,88 @@
+"""
+Счётчики ссылок на изображения рецептов и аватары.
+
+В хранилище с именами по содержимому (recipes.storage) один файл может
+быть изображением нескольких рецептов и аватаров, поэтому для каждого
+файла в StoredFile хранится количество ссылок на него. Когда ссылок не
+остаётся, файл и его уменьшенные копии удаляются после завершения
+транзакции.
+
+Удаление (collect), запись файла в хранилище (recipes.storage) и новая
+ссылка (add_reference) блокируют строку StoredFile файла. Запись в
+транзакции держит блокировку до ссылки на файл, поэтому collect не
+удалит файл, который хранилище только что нашло готовым.
+"""
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+
+from recipes.images import IMAGE_FIELDS, delete_variants
+from recipes.models import StoredFile
+
+
+def add_reference(name):
+    """Новая ссылка на файл."""
+    with transaction.atomic():
+        _, created = StoredFile.objects.select_for_update().get_or_create(
+            name=name, defaults={'references': 1}
+        )
+        if not created:
+            StoredFile.objects.filter(name=name).update(
+                references=F('references') + 1
+            )
+
+
+def remove_reference(name):
+    """Ссылка на файл удалена; файл без ссылок удаляется."""
+    StoredFile.objects.filter(name=name, references__gt=0).update(
+        references=F('references') - 1
+    )
+    transaction.on_commit(lambda: collect(name))
+
+
+def collect(name):
+    """Удаление файла и его копий, если на него нет ссылок.
+
+    Файлы удаляются под блокировкой строки файла, до её удаления. Без
+    строки файл уже удалён или снова записан для новой ссылки.
+    """
+    with transaction.atomic():
+        stored = StoredFile.objects.select_for_update().filter(
+            name=name
+        ).first()
+        if stored is None or stored.references > 0:
+            return
+        delete_variants(name)
+        default_storage.delete(name)
+        stored.delete()
+
+
+def get_name(instance):
+    """Текущий файл объекта."""
+    return getattr(instance, IMAGE_FIELDS[type(instance)]).name or ''
+
+
+def remember_name(instance):
+    """Запоминание файла объекта перед сохранением."""
+    if instance.pk is None:
+        instance._stored_name = ''
+        return
+    instance._stored_name = type(instance).objects.filter(
+        pk=instance.pk
+    ).values_list(IMAGE_FIELDS[type(instance)], flat=True).first() or ''
+
+
+def update_references(instance, deleted=False):
+    """Изменение ссылок после сохранения или удаления объекта."""
+    if deleted:
+        old_name, new_name = get_name(instance), ''
+    else:
+        old_name, new_name = instance._stored_name, get_name(instance)
+    instance._stored_name = new_name
+    if old_name == new_name:
+        return
+    if new_name:
+        add_reference(new_name)
+    if old_name:
+        remove_reference(old_name)
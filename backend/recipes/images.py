@@ -0,0 +1,174 @@
+"""
+Уменьшенные копии изображений рецептов и аватаров.
+
+После сохранения рецепта или пользователя с новым изображением задача
+ставится в пул потоков IMAGE_WORKERS (после завершения транзакции), а
+запрос не ждёт её выполнения. Для каждого размера из VARIANTS
+сохраняются копии в WebP и JPEG в каталоге копий исходного файла, а
+их пути записываются в поле <поле>_variants вместе с именем исходного
+файла: пока оно не совпадает с текущим изображением, копии считаются
+неготовыми. Копии удаляются вместе с исходным файлом (recipes.files).
+"""
+
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from recipes import tokens
+from recipes.models import DBUser, Recipe
+
+logger = logging.getLogger(__name__)
+
+# Наибольшая сторона копии в пикселях.
+VARIANTS = {
+    'thumbnail': 160,
+    'card': 480,
+    'full': 1280,
+}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+# Модель -> поле изображения.
+IMAGE_FIELDS = {
+    Recipe: 'image',
+    DBUser: 'avatar',
+}
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS, thread_name_prefix='images'
+)
+
+
+def get_variants_directory(name):
+    """Каталог копий изображения name."""
+    directory, filename = os.path.split(os.path.splitext(name)[0])
+    return os.path.join(directory, 'variants', filename)
+
+
+def make_variants(name):
+    """Сохранение копий изображения; возвращает их размеры и пути."""
+    with default_storage.open(name, 'rb') as file:
+        with Image.open(file) as image:
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    variants = {}
+    for variant, size in VARIANTS.items():
+        copy = image.copy()
+        copy.thumbnail((size, size), Image.LANCZOS)
+        variants[variant] = {'width': copy.width}
+        for extension, (image_format, options) in FORMATS.items():
+            converted = copy
+            if image_format == 'JPEG' and copy.mode != 'RGB':
+                converted = copy.convert('RGB')
+            elif copy.mode not in ('RGB', 'RGBA'):
+                converted = copy.convert('RGBA')
+            data = io.BytesIO()
+            converted.save(data, image_format, **options)
+            variants[variant][extension] = default_storage.save(
+                os.path.join(
+                    get_variants_directory(name), f'{variant}.{extension}'
+                ),
+                ContentFile(data.getvalue())
+            )
+    return variants
+
+
+def delete_variants(name):
+    """Удаление копий изображения name."""
+    directory = get_variants_directory(name)
+    try:
+        _, filenames = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for filename in filenames:
+        default_storage.delete(os.path.join(directory, filename))
+
+
+def process(model, pk):
+    """Создание копий текущего изображения объекта."""
+    field = IMAGE_FIELDS[model]
+    try:
+        current = model.objects.filter(pk=pk).values(
+            field, f'{field}_variants'
+        ).first()
+        if current is None:
+            return
+        name = current[field]
+        if (current[f'{field}_variants'] or {}).get('source') == name:
+            return
+        variants = {'source': name, 'variants': {}}
+        if name:
+            # Тот же файл у другого объекта: копии уже есть.
+            variants = model.objects.filter(**{
+                f'{field}_variants__source': name
+            }).values_list(f'{field}_variants', flat=True).first() or {
+                'source': name, 'variants': make_variants(name)
+            }
+        now = timezone.now()
+        updated = model.objects.filter(pk=pk, **{field: name}).update(
+            **{f'{field}_variants': variants},
+            **({'updated_at': now} if model is Recipe else {})
+        )
+        if updated and model is DBUser:
+            Recipe.objects.filter(author_id=pk).update(updated_at=now)
+            tokens.invalidate_user(pk)
+    except Exception:
+        logger.exception(
+            'Не удалось создать копии изображения %s с id=%s.',
+            model.__name__, pk
+        )
+
+
+def process_in_worker(model, pk):
+    """Задача пула: process со своим соединением с базой."""
+    close_old_connections()
+    try:
+        process(model, pk)
+    finally:
+        close_old_connections()
+
+
+def schedule(instance):
+    """Создание копий в пуле после завершения транзакции.
+
+    Ничего не делает, если копии текущего изображения уже есть.
+    """
+    field = IMAGE_FIELDS[type(instance)]
+    name = getattr(instance, field).name or ''
+    variants = getattr(instance, f'{field}_variants') or {}
+    if variants.get('source', '') == name:
+        return
+    model, pk = type(instance), instance.pk
+    transaction.on_commit(
+        lambda: executor.submit(process_in_worker, model, pk)
+    )
+
+
+def get_srcset(file, variants, build_url):
+    """Копии изображения для srcset: {формат: 'url ширинаw, ...'}.
+
+    None, если изображения нет или копии ещё не готовы.
+    """
+    if not file or not variants or variants.get('source') != file.name:
+        return None
+    srcset = {}
+    for extension in FORMATS:
+        # Маленькое изображение не увеличивается, ширины копий совпадают.
+        urls = {
+            variant['width']: variant[extension]
+            for variant in variants['variants'].values()
+        }
+        srcset[extension] = ', '.join(
+            f'{build_url(default_storage.url(name))} {width}w'
+            for width, name in urls.items()
+        )
+    return srcset
@@ -0,0 +1,315 @@
+"""
+Индекс продуктов для поиска по началу названия.
+
+Снимок всех продуктов хранится в файле INGREDIENTS_INDEX_PATH (по
+умолчанию во временном каталоге, своём для каждой базы) и отсортирован
+по названию в нижнем регистре. Каждый воркер отображает файл в память
+(mmap) только для чтения, поэтому в памяти снимок один на все воркеры
+gunicorn, а поиск идёт двоичный; в базу воркер обращается только для
+сверки отметки снимка (см. ниже).
+
+Файл пересобирается целиком (build) при изменении продуктов и после
+импорта данных, а после миграций (в том числе flush) удаляется
+(remove) и собирается при следующем поиске; воркеры замечают
+новый снимок по os.stat и отображают его заново. В заголовке снимка
+записана отметка базы и таблицы продуктов: количество, наибольший id и
+время изменения. Воркер сверяет её с базой, когда открывает файл, и
+затем не чаще раза в INGREDIENTS_INDEX_CHECK_INTERVAL секунд, поэтому
+снимок от другой базы, после её пересоздания или импорта в обход
+сигналов не используется. Правка названий SQL-запросом без updated_at
+отметку не меняет: после неё нужен build.
+
+Формат файла:
+    заголовок: b'FGI2', количество записей N (uint32), отметка
+    (16 байт);
+    N смещений записей (uint32);
+    записи: id (uint32), длины ключа, названия и единицы измерения
+    (uint16), затем сами ключ, название и единица измерения в UTF-8.
+"""
+
+import mmap
+import os
+import re
+import struct
+import tempfile
+import time
+from hashlib import sha256
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Max
+
+from recipes.constants import INGREDIENTS_INDEX_CHECK_INTERVAL
+from recipes.models import Ingredient
+
+MAGIC = b'FGI2'
+HEADER = struct.Struct('<4sI16s')
+OFFSET = struct.Struct('<I')
+RECORD = struct.Struct('<IHHH')
+# Как pg_trgm.similarity_threshold по умолчанию.
+SIMILARITY_THRESHOLD = 0.3
+
+
+def get_key(name):
+    """Ключ поиска: название без учёта регистра."""
+    return name.casefold().encode()
+
+
+def get_trigrams(text):
+    """Триграммы строки по правилам pg_trgm."""
+    trigrams = set()
+    for word in re.findall(r'\w+', text.casefold()):
+        word = f'  {word} '
+        trigrams.update(word[i:i + 3] for i in range(len(word) - 2))
+    return trigrams
+
+
+def get_similarity(trigrams, other_trigrams):
+    """Похожесть строк по их триграммам, как similarity() в pg_trgm."""
+    if not trigrams or not other_trigrams:
+        return 0
+    return len(trigrams & other_trigrams) / len(trigrams | other_trigrams)
+
+
+def get_database():
+    """Описание базы: СУБД, имя, хост и порт."""
+    database = connection.settings_dict
+    return (
+        connection.vendor, str(database['NAME']), database['HOST'],
+        str(database['PORT'])
+    )
+
+
+def get_path():
+    """Файл снимка: INGREDIENTS_INDEX_PATH или свой для базы."""
+    if settings.INGREDIENTS_INDEX_PATH:
+        return settings.INGREDIENTS_INDEX_PATH
+    database = sha256(repr(get_database()).encode()).hexdigest()[:12]
+    return os.path.join(
+        tempfile.gettempdir(), f'foodgram_ingredients_{database}.idx'
+    )
+
+
+def make_stamp(count, max_id, updated_at):
+    """Отметка базы и таблицы продуктов для заголовка снимка."""
+    return sha256(repr((
+        get_database(), count, max_id,
+        updated_at and updated_at.isoformat()
+    )).encode()).digest()[:16]
+
+
+def get_stamp():
+    """Текущая отметка таблицы продуктов."""
+    state = Ingredient.objects.aggregate(
+        count=Count('pk'), max_id=Max('pk'), updated_at=Max('updated_at')
+    )
+    return make_stamp(state['count'], state['max_id'], state['updated_at'])
+
+
+def get_file_stamp(stat):
+    """Отметка файла: новый снимок - новый inode, время или размер."""
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def build(path=None):
+    """Пересборка снимка продуктов."""
+    path = path or get_path()
+    rows = list(Ingredient.objects.values_list(
+        'id', 'name', 'measurement_unit', 'updated_at'
+    ))
+    stamp = make_stamp(
+        len(rows),
+        max((row[0] for row in rows), default=None),
+        max((row[3] for row in rows), default=None)
+    )
+    records = sorted(
+        (get_key(name), id, name.encode(), measurement_unit.encode())
+        for id, name, measurement_unit, _ in rows
+    )
+    offset = HEADER.size + OFFSET.size * len(records)
+    offsets = []
+    body = []
+    for key, id, name, measurement_unit in records:
+        offsets.append(OFFSET.pack(offset))
+        record = RECORD.pack(
+            id, len(key), len(name), len(measurement_unit)
+        ) + key + name + measurement_unit
+        body.append(record)
+        offset += len(record)
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, len(records), stamp))
+            file.writelines(offsets)
+            file.writelines(body)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return len(records)
+
+
+def remove(path=None):
+    """Удаление снимка продуктов."""
+    try:
+        os.remove(path or get_path())
+    except FileNotFoundError:
+        pass
+
+
+def schedule_build():
+    """Пересборка снимка после завершения текущей транзакции.
+
+    Несколько изменений продуктов в одной транзакции приводят к одной
+    пересборке. Отложенные вызовы хранятся у соединения потока и
+    отбрасываются вместе с откатом транзакции или точки сохранения.
+    """
+    connection = transaction.get_connection()
+    if any(
+        func is build
+        for savepoint_ids, func, robust in connection.run_on_commit
+    ):
+        return
+    transaction.on_commit(build)
+
+
+class IngredientIndex:
+    """Поиск продуктов по снимку в памяти."""
+
+    def __init__(self, path=None):
+        """Файл снимка; открывается при первом поиске."""
+        self.path = path
+        self.stamp = None
+        self.snapshot = None
+        self.count = 0
+        self.trigrams = None
+        self.db_stamp = None
+        self.checked_at = 0
+
+    def open(self, path):
+        """Снимок из файла path: данные, количество записей и отметки.
+
+        None, если файла нет или он другого формата.
+        """
+        try:
+            with open(path, 'rb') as file:
+                snapshot = mmap.mmap(
+                    file.fileno(), 0, access=mmap.ACCESS_READ
+                )
+                stat = os.fstat(file.fileno())
+        except (FileNotFoundError, ValueError):
+            return None
+        if len(snapshot) < HEADER.size:
+            return None
+        magic, count, db_stamp = HEADER.unpack_from(snapshot)
+        if magic != MAGIC:
+            return None
+        return snapshot, count, db_stamp, get_file_stamp(stat)
+
+    def refresh(self):
+        """Отображение в память актуального снимка.
+
+        Снимок без отметки текущей базы и таблицы продуктов
+        пересобирается.
+        """
+        path = self.path or get_path()
+        now = time.monotonic()
+        try:
+            file_stamp = get_file_stamp(os.stat(path))
+        except FileNotFoundError:
+            file_stamp = None
+        if self.stamp is not None and file_stamp == self.stamp:
+            if now - self.checked_at < INGREDIENTS_INDEX_CHECK_INTERVAL:
+                return
+            if self.db_stamp == get_stamp():
+                self.checked_at = now
+                return
+        opened = self.open(path)
+        if opened is None or opened[2] != get_stamp():
+            build(path)
+            opened = self.open(path)
+            if opened is None:
+                raise ValueError(
+                    f'Файл {path} не является индексом продуктов.'
+                )
+        self.snapshot, self.count, self.db_stamp, self.stamp = opened
+        self.checked_at = now
+        self.trigrams = None
+
+    def get_record(self, index):
+        """Ключ и данные продукта по номеру записи."""
+        offset, = OFFSET.unpack_from(
+            self.snapshot, HEADER.size + OFFSET.size * index
+        )
+        id, key_length, name_length, unit_length = RECORD.unpack_from(
+            self.snapshot, offset
+        )
+        start = offset + RECORD.size
+        key = self.snapshot[start:start + key_length]
+        start += key_length
+        name = self.snapshot[start:start + name_length]
+        start += name_length
+        measurement_unit = self.snapshot[start:start + unit_length]
+        return key, {
+            'id': id,
+            'name': name.decode(),
+            'measurement_unit': measurement_unit.decode(),
+        }
+
+    def search(self, prefix, limit):
+        """Не более limit продуктов, название которых начинается с prefix."""
+        self.refresh()
+        prefix = get_key(prefix)
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.get_record(middle)[0] < prefix:
+                low = middle + 1
+            else:
+                high = middle
+        ingredients = []
+        for index in range(low, min(self.count, low + limit)):
+            key, ingredient = self.get_record(index)
+            if not key.startswith(prefix):
+                break
+            ingredients.append(ingredient)
+        return ingredients
+
+    def fuzzy_search(self, query, limit):
+        """Продукты, ранжированные по совпадению с query.
+
+        Сначала названия, начинающиеся с query, затем содержащие его,
+        затем похожие по триграммам; внутри групп — по убыванию
+        похожести. Перебираются все записи снимка, поэтому это запасной
+        вариант для баз без pg_trgm.
+        """
+        self.refresh()
+        if self.trigrams is None:
+            self.trigrams = [
+                get_trigrams(self.get_record(index)[0].decode())
+                for index in range(self.count)
+            ]
+        key = get_key(query)
+        query_trigrams = get_trigrams(query)
+        ranked = []
+        for index in range(self.count):
+            record_key = self.get_record(index)[0]
+            similarity = get_similarity(query_trigrams, self.trigrams[index])
+            if record_key.startswith(key):
+                rank = 0
+            elif key in record_key:
+                rank = 1
+            elif similarity >= SIMILARITY_THRESHOLD:
+                rank = 2
+            else:
+                continue
+            ranked.append((rank, -similarity, record_key, index))
+        ranked.sort()
+        return [
+            self.get_record(index)[1] for *_, index in ranked[:limit]
+        ]
+
+
+ingredient_index = IngredientIndex()
@@ -1,32 +1,161 @@
-"""Базовый класс для импорта json-данных."""
+"""Базовый класс для импорта справочников из CSV- и JSON-файлов."""
 
-import json
+import glob
+import os
+from functools import partial
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 from foodgram_backend.settings import PATH_FOR_CSV
+from recipes import ingredient_index
+from recipes.catalogue import CATALOGUES, CatalogueLoader, read_rows
+from recipes.constants import IMPORT_CHUNK_SIZE, MAX_REPORTED_ERRORS
+from recipes.models import Ingredient
+
+EXTENSIONS = ('.csv', '.json')
 
 
 class Import(BaseCommand):
-    """Загрузка json-данных."""
+    """Потоковая загрузка продуктов и тегов.
+
+    Без аргументов загружаются файлы filename из PATH_FOR_CSV.
+    Справочник берётся из model или из имени файла (ingredients, tags).
+    С --sync записываются только новые и изменённые строки.
+    """
 
-    help = 'Загрузка json-данных'
-    filename = 'filename.json'
+    help = 'Загрузка продуктов и тегов из CSV- и JSON-файлов.'
+    filename = '*'
     model = None
 
+    def add_arguments(self, parser):
+        """Файлы и параметры загрузки."""
+        parser.add_argument(
+            'paths', nargs='*',
+            help=f'Файлы; по умолчанию {PATH_FOR_CSV}{self.filename}.'
+        )
+        parser.add_argument(
+            '--catalogue', choices=CATALOGUES,
+            help='Справочник для всех файлов вместо поиска по имени.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=IMPORT_CHUNK_SIZE,
+            help='Строк в одной части.'
+        )
+        parser.add_argument(
+            '--method', choices=('auto', 'copy', 'bulk'), default='auto',
+            help='copy - COPY в PostgreSQL, bulk - bulk_create, '
+                 'auto - COPY, если база PostgreSQL.'
+        )
+        parser.add_argument(
+            '--sync', action='store_true',
+            help='Добавлять новые и изменять отличающиеся записи, '
+                 'не трогая совпадающие.'
+        )
+        parser.add_argument(
+            '--delete', action='store_true',
+            help='С --sync удалять записи, которых нет в файле '
+                 '(кроме используемых в рецептах).'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='С --sync только показать, что будет изменено.'
+        )
+
+    def get_paths(self, paths):
+        """Файлы для загрузки."""
+        if paths:
+            return paths
+        return sorted(
+            path for path in glob.glob(PATH_FOR_CSV + self.filename)
+            if path.endswith(EXTENSIONS)
+        )
+
+    def get_catalogue(self, path, catalogue):
+        """Модель, поля и ключ справочника для файла."""
+        if catalogue:
+            return CATALOGUES[catalogue]
+        for name, (model, fields, key) in CATALOGUES.items():
+            if model is self.model or (
+                self.model is None and name in os.path.basename(path)
+            ):
+                return model, fields, key
+        raise CommandError(f'Не найден справочник для {path}.')
+
+    def report_progress(self, path, stats):
+        """Вывод хода загрузки после каждой части."""
+        self.stdout.write(
+            f'{path}: {stats.processed} строк, '
+            f'{stats.rate:.0f} строк/с.'
+        )
+
+    def report(self, path, stats, options):
+        """Итоги загрузки файла."""
+        for number, message in stats.errors[:MAX_REPORTED_ERRORS]:
+            self.stderr.write(f'{path}, строка {number}: {message}')
+        if len(stats.errors) > MAX_REPORTED_ERRORS:
+            self.stderr.write(
+                f'{path}: и ещё {len(stats.errors) - MAX_REPORTED_ERRORS} '
+                'строк с ошибками.'
+            )
+        if not options['sync']:
+            self.stdout.write(
+                f'Из файла {path} добавлено {stats.inserted}, '
+                f'пропущено {stats.skipped}, с ошибками {stats.failed} '
+                f'за {stats.elapsed:.1f} с ({stats.rate:.0f} строк/с).'
+            )
+            return
+        deleted = (
+            f'удалено {stats.deleted} (оставлено используемых в рецептах '
+            f'{stats.kept}), ' if options['delete'] else ''
+        )
+        self.stdout.write(
+            f'{"Без записи: " if options["dry_run"] else ""}'
+            f'синхронизация с {path}: добавлено {stats.inserted}, '
+            f'изменено {stats.updated}, без изменений {stats.unchanged}, '
+            f'{deleted}пропущено {stats.skipped}, '
+            f'с ошибками {stats.failed} '
+            f'за {stats.elapsed:.1f} с ({stats.rate:.0f} строк/с).'
+        )
+
     def handle(self, *args, **options):
         """Загрузка данных."""
-        try:
-            with open(
-                PATH_FOR_CSV + self.filename, 'r', encoding='utf-8'
-            ) as f:
-                data_import = self.model.objects.bulk_create(
-                    (self.model(**data) for data in json.load(f)),
-                    ignore_conflicts=True
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size должен быть больше нуля.')
+        if (options['delete'] or options['dry_run']) and not options['sync']:
+            raise CommandError(
+                '--delete и --dry-run работают только с --sync.'
+            )
+        paths = self.get_paths(options['paths'])
+        if not paths:
+            raise CommandError('Нет файлов для загрузки.')
+        rebuild_index = False
+        for path in paths:
+            model, fields, key = self.get_catalogue(
+                path, options['catalogue']
+            )
+            try:
+                loader = CatalogueLoader(
+                    model, fields, options['chunk_size'], options['method'],
+                    key=key
                 )
-            self.stdout.write(
-                f'Из файла {self.filename} загружено '
-                f'{len(data_import)} записей.'
+                with open(path, 'r', encoding='utf-8', newline='') as file:
+                    rows = read_rows(path, file, fields)
+                    progress = partial(self.report_progress, path)
+                    if options['sync']:
+                        stats = loader.sync(
+                            rows, options['delete'], options['dry_run'],
+                            progress
+                        )
+                    else:
+                        stats = loader.load(rows, progress)
+            except OSError as error:
+                raise CommandError(f'Не удалось прочитать {path}: {error}')
+            except ValueError as error:
+                raise CommandError(f'Ошибка в {path}: {error}')
+            self.report(path, stats, options)
+            rebuild_index |= (
+                model is Ingredient and not options['dry_run']
+                and stats.inserted + stats.updated + stats.deleted > 0
             )
-        except Exception as error:
-            self.stdout.write(f'Ошибка: {error} при импорте {self.filename}.')
+        if rebuild_index:
+            ingredient_index.build()
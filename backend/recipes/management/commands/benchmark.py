@@ -0,0 +1,186 @@
+"""Нагрузочная проверка запросов чтения к запущенному серверу."""
+
+import asyncio
+import json
+import statistics
+import time
+from urllib.parse import urlsplit
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+ENDPOINTS = ('recipes', 'recipe', 'tags', 'ingredients', 'short_link')
+
+
+class Command(BaseCommand):
+    """Запросы к основным адресам чтения: запросов в секунду и задержки.
+
+    Каждый адрес проверяется отдельно: requests запросов, не больше
+    concurrency одновременно, каждый в новом соединении (синхронные
+    воркеры gunicorn не держат keep-alive, так сравнение честнее).
+    Id рецепта и короткая ссылка берутся из API самого сервера.
+    С --slow-clients во время проверки открыты соединения медленных
+    клиентов, которые отправляют заголовки с задержкой: так синхронный
+    воркер занят, пока ждёт данные клиента.
+    """
+
+    help = 'Нагрузочная проверка запросов чтения к запущенному серверу.'
+
+    def add_arguments(self, parser):
+        """Адрес сервера и параметры нагрузки."""
+        parser.add_argument(
+            'url', nargs='?', default='http://127.0.0.1:8000',
+            help='Адрес сервера.'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=50,
+            help='Одновременных запросов.'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=2000,
+            help='Запросов на каждый адрес.'
+        )
+        parser.add_argument(
+            '--token', default='',
+            help='Токен пользователя; без него запросы анонимные.'
+        )
+        parser.add_argument(
+            '--search', default='мо',
+            help='Начало названия продукта для поиска.'
+        )
+        parser.add_argument(
+            '--slow-clients', type=int, default=0,
+            help='Медленных клиентов во время проверки.'
+        )
+        parser.add_argument(
+            '--slow-delay', type=float, default=1.0,
+            help='Задержка медленного клиента перед концом заголовков, с.'
+        )
+        parser.add_argument(
+            '--endpoint', action='append', choices=ENDPOINTS,
+            help='Проверяемый адрес; по умолчанию все.'
+        )
+
+    def get_json(self, path):
+        """Ответ сервера в JSON, для выбора проверяемых адресов."""
+        request = Request(self.url + path, headers=self.headers)
+        try:
+            with urlopen(request, timeout=10) as response:
+                return json.load(response)
+        except OSError as error:
+            raise CommandError(f'{path}: {error}')
+
+    def get_paths(self, search):
+        """Пути проверяемых адресов."""
+        recipes = self.get_json('/api/recipes/?limit=1')['results']
+        if not recipes:
+            raise CommandError('На сервере нет рецептов.')
+        pk = recipes[0]['id']
+        short_link = self.get_json(f'/api/recipes/{pk}/get-link/')
+        return {
+            'recipes': '/api/recipes/',
+            'recipe': f'/api/recipes/{pk}/',
+            'tags': '/api/tags/',
+            'ingredients': f'/api/ingredients/?name={search}',
+            'short_link': urlsplit(short_link['short-link']).path,
+        }
+
+    async def fetch(self, path, delay=0):
+        """Запрос в новом соединении; код ответа.
+
+        Конец заголовков отправляется через delay секунд.
+        """
+        reader, writer = await asyncio.open_connection(
+            self.host, self.port, ssl=self.ssl
+        )
+        headers = ''.join(
+            f'{name}: {value}\r\n' for name, value in self.headers.items()
+        )
+        writer.write((
+            f'GET {path} HTTP/1.1\r\nHost: {self.netloc}\r\n'
+            f'Connection: close\r\n{headers}'
+        ).encode())
+        if delay:
+            await writer.drain()
+            await asyncio.sleep(delay)
+        writer.write(b'\r\n')
+        await writer.drain()
+        status_line = await reader.readline()
+        while await reader.read(65536):
+            pass
+        writer.close()
+        return int(status_line.split()[1])
+
+    async def slow_client(self, path, delay):
+        """Медленные запросы один за другим, пока задачу не отменят."""
+        while True:
+            try:
+                await self.fetch(path, delay)
+            except (OSError, IndexError, ValueError):
+                await asyncio.sleep(delay)
+
+    async def run(self, path, count, concurrency, slow_clients, delay):
+        """Задержки успешных запросов, число ошибок и общее время."""
+        slow = [
+            asyncio.ensure_future(self.slow_client(path, delay))
+            for _ in range(slow_clients)
+        ]
+        latencies = []
+        errors = 0
+        remaining = iter(range(count))
+
+        async def worker():
+            nonlocal errors
+            for _ in remaining:
+                start = time.perf_counter()
+                try:
+                    status = await self.fetch(path)
+                except (OSError, IndexError, ValueError):
+                    status = None
+                if status is not None and status < 400:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        for task in slow:
+            task.cancel()
+        await asyncio.gather(*slow, return_exceptions=True)
+        return latencies, errors, elapsed
+
+    def handle(self, *args, **options):
+        """Проверка адресов по очереди и таблица результатов."""
+        self.url = options['url'].rstrip('/')
+        parts = urlsplit(self.url)
+        self.netloc = parts.netloc
+        self.host = parts.hostname
+        self.ssl = parts.scheme == 'https'
+        self.port = parts.port or (443 if self.ssl else 80)
+        self.headers = {'Accept': 'application/json'}
+        if options['token']:
+            self.headers['Authorization'] = f'Token {options["token"]}'
+        paths = self.get_paths(options['search'])
+        self.stdout.write(
+            f'{"адрес":<12}{"запр/с":>10}{"p50, мс":>10}{"p95, мс":>10}'
+            f'{"p99, мс":>10}{"ошибки":>8}'
+        )
+        for endpoint in options['endpoint'] or ENDPOINTS:
+            latencies, errors, elapsed = asyncio.run(self.run(
+                paths[endpoint], options['requests'], options['concurrency'],
+                options['slow_clients'], options['slow_delay']
+            ))
+            if len(latencies) < 2:
+                self.stdout.write(f'{endpoint:<12}{"-":>10}{"":>30}'
+                                  f'{errors:>8}')
+                continue
+            percentiles = statistics.quantiles(latencies, n=100)
+            self.stdout.write(
+                f'{endpoint:<12}{len(latencies) / elapsed:>10.0f}'
+                + ''.join(
+                    f'{percentiles[p - 1] * 1000:>10.1f}'
+                    for p in (50, 95, 99)
+                )
+                + f'{errors:>8}'
+            )
@@ -0,0 +1,7 @@
+"""Загрузка продуктов и тегов из CSV- и JSON-файлов."""
+
+from recipes.management.commands.base_import_command import Import
+
+
+class Command(Import):
+    """Загрузка продуктов и тегов из CSV- и JSON-файлов."""
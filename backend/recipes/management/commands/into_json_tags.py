@@ -1,6 +1,6 @@
 """Загрузка json-данных в модель Теги."""
 
-from backend.recipes.management.commands.base_import_command import Import
+from recipes.management.commands.base_import_command import Import
 from recipes.models import Tag
 
 
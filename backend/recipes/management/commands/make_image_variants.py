@@ -0,0 +1,23 @@
+"""Создание недостающих копий изображений рецептов и аватаров."""
+
+from django.core.management.base import BaseCommand
+
+from recipes.images import IMAGE_FIELDS, process
+
+
+class Command(BaseCommand):
+    """Копии изображений, которые не успели или не смогли создаться."""
+
+    help = 'Создание недостающих копий изображений рецептов и аватаров.'
+
+    def handle(self, *args, **options):
+        """Создание копий по очереди, без пула."""
+        for model, field in IMAGE_FIELDS.items():
+            count = 0
+            for pk, name, variants in model.objects.values_list(
+                'pk', field, f'{field}_variants'
+            ).iterator():
+                if (variants or {}).get('source', '') != name:
+                    process(model, pk)
+                    count += 1
+            self.stdout.write(f'{model.__name__}: обработано {count}.')
@@ -0,0 +1,19 @@
+"""Пересчёт продуктов списков покупок."""
+
+from django.core.management.base import BaseCommand
+
+from recipes.shopping_list import rebuild
+
+
+class Command(BaseCommand):
+    """Пересчёт сумм продуктов списков покупок по рецептам."""
+
+    help = 'Пересчёт продуктов списков покупок по рецептам.'
+
+    def handle(self, *args, **options):
+        """Пересчёт и отчёт по изменённым строкам."""
+        stats = rebuild()
+        self.stdout.write(
+            'Продукты списков покупок: добавлено {created}, '
+            'изменено {updated}, удалено {deleted}.'.format(**stats)
+        )
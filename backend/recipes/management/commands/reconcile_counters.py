@@ -0,0 +1,17 @@
+"""Исправление счётчиков избранного, рецептов и подписок."""
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from recipes.counters import reconcile
+
+
+class Command(BaseCommand):
+    """Пересчёт счётчиков, разошедшихся с количеством записей."""
+
+    help = 'Исправление счётчиков избранного, рецептов и подписок.'
+
+    def handle(self, *args, **options):
+        """Пересчёт и отчёт по каждому счётчику."""
+        for counter, fixed in reconcile(apps).items():
+            self.stdout.write(f'{counter}: исправлено {fixed}.')
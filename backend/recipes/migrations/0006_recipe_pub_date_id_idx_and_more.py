@@ -0,0 +1,21 @@
+# Generated by Django 4.2.17 on 2026-10-18 19:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_alter_recipeingredient_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dbuser',
+            index=models.Index(fields=['username', 'id'], name='dbuser_username_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-pub_date', '-id'], name='recipe_pub_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations
+
+CREATE_INDEX = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS ingredient_name_trgm_idx '
+    'ON recipes_ingredient USING gin ((UPPER(name::text)) gin_trgm_ops)',
+)
+DROP_INDEX = ('DROP INDEX IF EXISTS ingredient_name_trgm_idx',)
+
+
+def run_sql(statements):
+    """Выполнение SQL только в PostgreSQL."""
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_pub_date_id_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sql(CREATE_INDEX), run_sql(DROP_INDEX)),
+    ]
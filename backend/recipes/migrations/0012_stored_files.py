@@ -0,0 +1,43 @@
+# Generated by Django 4.2.17 on 2026-10-18 20:01
+
+from collections import Counter
+
+from django.db import migrations, models
+
+
+def count_references(apps, schema_editor):
+    """Ссылки на уже загруженные изображения и аватары."""
+    references = Counter()
+    for model, field in (('Recipe', 'image'), ('DBUser', 'avatar')):
+        references.update(
+            apps.get_model('recipes', model).objects.exclude(
+                **{field: ''}
+            ).values_list(field, flat=True).iterator()
+        )
+    apps.get_model('recipes', 'StoredFile').objects.bulk_create(
+        apps.get_model('recipes', 'StoredFile')(name=name, references=count)
+        for name, count in references.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Файл')),
+                ('references', models.PositiveIntegerField(default=0, verbose_name='Ссылок')),
+            ],
+            options={
+                'verbose_name': 'файл',
+                'verbose_name_plural': 'Файлы',
+            },
+        ),
+        migrations.RunPython(count_references, migrations.RunPython.noop),
+    ]
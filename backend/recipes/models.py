@@ -1,6 +1,7 @@
 """
 Модели.
 
+CountersModel - Модель со счётчиками, которые не пишет save().
 Ingredient- Продукты.
 Tag - Теги.
 Recipe - Рецепты.
@@ -9,6 +10,8 @@ DBUser - Пользователи.
 SubscriptionsAdmin - Подписки.
 Favorites - Избранное.
 ShoppingCart - Список покупок.
+ShoppingCartIngredient - Продукты списка покупок.
+StoredFile - Ссылки на файлы в хранилище.
 """
 
 from django.contrib.auth.models import AbstractUser
@@ -21,10 +24,41 @@ from recipes.constants import (EMAIL_MAX_LENGTH, LOOK_TEXT,
                                MAX_LEN_TEXT, MAX_LENGTH_FIRST_NAME,
                                MAX_LENGTH_LAST_NAME, MAX_LENGTH_USERNAME,
                                MIN_COOKING_TIME)
+from recipes.counters import COUNTERS
 from recipes.validators import validate_username
 
 
-class DBUser(AbstractUser):
+class CountersModel(models.Model):
+    """Модель со счётчиками recipes.counters.
+
+    Счётчики меняются только через F() (recipes.counters), поэтому
+    сохранение существующего объекта их не пишет: иначе объект,
+    загруженный до изменения счётчика, вернул бы ему старое значение.
+    """
+
+    class Meta:
+        """Абстрактная модель."""
+
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        """Сохранение; счётчики пишутся только при создании."""
+        if (
+            not self._state.adding and not kwargs.get('force_insert')
+            and kwargs.get('update_fields') is None
+        ):
+            counters = {
+                field for label, field, *_ in COUNTERS
+                if label == self._meta.label
+            }
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in counters
+            ]
+        super().save(*args, **kwargs)
+
+
+class DBUser(CountersModel, AbstractUser):
     """Пользователи."""
 
     email = models.EmailField(
@@ -41,6 +75,18 @@ class DBUser(AbstractUser):
     first_name = models.CharField('Имя', max_length=MAX_LENGTH_FIRST_NAME)
     last_name = models.CharField('Фамилия', max_length=MAX_LENGTH_LAST_NAME)
     avatar = models.ImageField(upload_to='users/images/', blank=True)
+    avatar_variants = models.JSONField(
+        'Копии аватара', default=dict, blank=True, editable=False
+    )
+    recipes_count = models.PositiveIntegerField(
+        'Рецептов', default=0, editable=False
+    )
+    subscribers_count = models.PositiveIntegerField(
+        'Подписчиков', default=0, editable=False
+    )
+    subscriptions_count = models.PositiveIntegerField(
+        'Подписок', default=0, editable=False
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -51,6 +97,11 @@ class DBUser(AbstractUser):
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
         ordering = ('username',)
+        indexes = (
+            models.Index(
+                fields=('username', 'id'), name='dbuser_username_id_idx'
+            ),
+        )
 
     def __str__(self):
         """Отображение имени пользователя."""
@@ -62,6 +113,7 @@ class Tag(models.Model):
 
     name = models.CharField('Название', max_length=MAX_LEN_TAG, unique=True)
     slug = models.SlugField('Слаг', max_length=MAX_LEN_TAG, unique=True)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
 
     class Meta:
         """Мета класс Тегов."""
@@ -83,6 +135,7 @@ class Ingredient(models.Model):
         'Единица измерения',
         max_length=MAX_LEN_MEASUREMENT_UNIT
     )
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
 
     class Meta:
         """Мета класс продуктов."""
@@ -102,7 +155,7 @@ class Ingredient(models.Model):
         return f'{self.name[:LOOK_TEXT]} ({self.measurement_unit})'
 
 
-class Recipe(models.Model):
+class Recipe(CountersModel):
     """Рецепты."""
 
     name = models.CharField('Название', max_length=MAX_LEN_TEXT)
@@ -112,6 +165,9 @@ class Recipe(models.Model):
         validators=[MinValueValidator(MIN_COOKING_TIME)]
     )
     image = models.ImageField('Изображение', upload_to='recipes/images/')
+    image_variants = models.JSONField(
+        'Копии изображения', default=dict, blank=True, editable=False
+    )
     tags = models.ManyToManyField(Tag, verbose_name='Теги')
     ingredients = models.ManyToManyField(
         Ingredient,
@@ -119,6 +175,17 @@ class Recipe(models.Model):
         verbose_name='Продукты',
     )
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+        help_text='Меняется и при изменении тегов, продуктов и автора.'
+    )
+    favorites_count = models.PositiveIntegerField(
+        'В избранном', default=0, editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'В списках покупок', default=0, editable=False
+    )
     author = models.ForeignKey(
         DBUser,
         on_delete=models.CASCADE,
@@ -133,6 +200,11 @@ class Recipe(models.Model):
         verbose_name = 'рецепт'
         verbose_name_plural = 'Рецепты'
         default_related_name = 'recipes'
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'), name='recipe_pub_date_id_idx'
+            ),
+        )
 
     def __str__(self):
         """Отображение название рецепта."""
@@ -239,6 +311,49 @@ class ShoppingCart(models.Model):
         )
 
 
+class ShoppingCartIngredient(models.Model):
+    """Продукты списка покупок.
+
+    Сумма продуктов всех рецептов из списка покупок пользователя,
+    поддерживается в recipes.shopping_list при изменении списка покупок
+    и продуктов рецептов.
+    """
+
+    user = models.ForeignKey(
+        DBUser,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_ingredients',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_ingredients',
+        verbose_name='Продукт'
+    )
+    total_amount = models.PositiveIntegerField('Количество')
+
+    class Meta:
+        """Мета класс продуктов списка покупок."""
+
+        verbose_name = 'продукт списка покупок'
+        verbose_name_plural = 'Продукты списков покупок'
+        ordering = ('user', 'ingredient')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_cart_ingredient',
+            )
+        ]
+
+    def __str__(self):
+        """Отображение продукта в списке покупок."""
+        return (
+            f'{self.total_amount} {self.ingredient} в списке покупок '
+            f'у {self.user}'
+        )
+
+
 class Subscriptions(models.Model):
     """Подписки."""
 
@@ -274,3 +389,20 @@ class Subscriptions(models.Model):
     def __str__(self):
         """Отображение связи подписок."""
         return f'{self.subscriber} подписан на {self.author}'
+
+
+class StoredFile(models.Model):
+    """Количество ссылок на файл в хранилище."""
+
+    name = models.CharField('Файл', max_length=255, unique=True)
+    references = models.PositiveIntegerField('Ссылок', default=0)
+
+    class Meta:
+        """Мета данные файлов."""
+
+        verbose_name = 'файл'
+        verbose_name_plural = 'Файлы'
+
+    def __str__(self):
+        """Отображение файла."""
+        return self.name
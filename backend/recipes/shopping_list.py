@@ -0,0 +1,141 @@
+"""
+Продукты списков покупок.
+
+ShoppingCartIngredient хранит сумму продуктов всех рецептов из списка
+покупок пользователя. Суммы меняются на разницу (add_recipe,
+remove_recipe, recipe_ingredients_changed), а не пересчитываются
+целиком, поэтому скачивание списка покупок читает готовые итоги.
+Разошедшиеся суммы пересчитывает rebuild (команда
+rebuild_shopping_lists).
+"""
+
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Greatest
+
+from recipes.models import (RecipeIngredient, ShoppingCart,
+                            ShoppingCartIngredient)
+
+
+def get_amounts(recipe):
+    """Количество каждого продукта в рецепте."""
+    return Counter(dict(
+        RecipeIngredient.objects.filter(recipe=recipe).values(
+            'ingredient'
+        ).annotate(amount=Sum('amount')).values_list('ingredient', 'amount')
+    ))
+
+
+def apply_delta(users, delta):
+    """Изменение сумм продуктов у пользователей на delta.
+
+    Недостающие строки сначала вставляются с нулём без ошибки при
+    конфликте, поэтому одновременное добавление рецептов с общим
+    продуктом не нарушает уникальность, а суммы меняются через F().
+    Сумма не уходит ниже нуля, даже если уже разошлась с рецептами.
+    """
+    delta = {
+        ingredient: amount for ingredient, amount in delta.items() if amount
+    }
+    users = list(users)
+    if not users or not delta:
+        return
+    with transaction.atomic():
+        ShoppingCartIngredient.objects.bulk_create(
+            (
+                ShoppingCartIngredient(
+                    user_id=user, ingredient_id=ingredient, total_amount=0
+                )
+                for user in users
+                for ingredient, amount in delta.items()
+                if amount > 0
+            ),
+            ignore_conflicts=True
+        )
+        items = ShoppingCartIngredient.objects.filter(
+            user__in=users, ingredient__in=list(delta)
+        )
+        for ingredient, amount in delta.items():
+            items.filter(ingredient=ingredient).update(
+                total_amount=Greatest(F('total_amount') + amount, 0)
+            )
+        items.filter(total_amount__lte=0).delete()
+
+
+def add_recipe(user, recipe):
+    """Рецепт добавлен в список покупок."""
+    apply_delta([user.pk], get_amounts(recipe))
+
+
+def remove_recipe(user, recipe):
+    """Рецепт удалён из списка покупок."""
+    apply_delta([user.pk], {
+        ingredient: -amount
+        for ingredient, amount in get_amounts(recipe).items()
+    })
+
+
+@contextmanager
+def recipe_ingredients_changed(recipe):
+    """Перезапись продуктов рецепта внутри блока with.
+
+    Списки покупок, в которых есть рецепт, меняются на разницу между
+    продуктами рецепта до и после блока.
+    """
+    with transaction.atomic():
+        old_amounts = get_amounts(recipe)
+        yield
+        delta = get_amounts(recipe)
+        delta.subtract(old_amounts)
+        apply_delta(
+            ShoppingCart.objects.filter(recipe=recipe).values_list(
+                'user', flat=True
+            ),
+            delta
+        )
+
+
+def rebuild():
+    """Пересчёт сумм продуктов всех списков покупок по рецептам.
+
+    Возвращает количество добавленных, изменённых и удалённых строк.
+    """
+    stats = {'created': 0, 'updated': 0, 'deleted': 0}
+    with transaction.atomic():
+        actual = {
+            (user, ingredient): amount
+            for user, ingredient, amount in ShoppingCart.objects.filter(
+                recipe__recipeingredients__isnull=False
+            ).values(
+                'user', 'recipe__recipeingredients__ingredient'
+            ).annotate(
+                amount=Sum('recipe__recipeingredients__amount')
+            ).values_list(
+                'user', 'recipe__recipeingredients__ingredient', 'amount'
+            ).order_by()
+        }
+        changed = []
+        removed = []
+        for item in ShoppingCartIngredient.objects.select_for_update():
+            amount = actual.pop((item.user_id, item.ingredient_id), None)
+            if amount is None:
+                removed.append(item.pk)
+            elif amount != item.total_amount:
+                item.total_amount = amount
+                changed.append(item)
+        stats['deleted'] = ShoppingCartIngredient.objects.filter(
+            pk__in=removed
+        ).delete()[0]
+        stats['updated'] = ShoppingCartIngredient.objects.bulk_update(
+            changed, ('total_amount',)
+        )
+        stats['created'] = len(ShoppingCartIngredient.objects.bulk_create(
+            ShoppingCartIngredient(
+                user_id=user, ingredient_id=ingredient, total_amount=amount
+            )
+            for (user, ingredient), amount in actual.items()
+        ))
+    return stats
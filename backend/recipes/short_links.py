@@ -0,0 +1,134 @@
+"""
+Короткие ссылки на рецепты.
+
+Код ссылки - id рецепта, закодированный short_url (биты перемешаны,
+поэтому соседние рецепты получают непохожие коды). Алфавит без цифр,
+чтобы коды не путались со старыми ссылками вида /s/<id>/. Код
+раскодируется без запроса в базу, а существование рецепта проверяется
+через RecipeExistsCache.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import short_url
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from recipes.constants import (SHORT_LINK_ALPHABET, SHORT_LINK_CACHE_SIZE,
+                               SHORT_LINK_CACHE_TIMEOUT, SHORT_LINK_MIN_LENGTH)
+from recipes.models import Recipe
+
+encoder = short_url.UrlEncoder(alphabet=SHORT_LINK_ALPHABET)
+# Наибольшее значение bigint.
+MAX_PK = 2 ** 63 - 1
+
+
+def encode(pk):
+    """Код короткой ссылки на рецепт."""
+    return encoder.encode_url(pk, min_length=SHORT_LINK_MIN_LENGTH)
+
+
+def decode(code):
+    """Id рецепта по коду; None, если код неверный.
+
+    Код с лишними ведущими символами или не из алфавита неверен, чтобы
+    у рецепта был ровно один адрес.
+    """
+    if len(code) > MAX_CODE_LENGTH:
+        return None
+    try:
+        pk = encoder.decode_url(code)
+    except ValueError:
+        return None
+    if not 0 < pk <= MAX_PK or encode(pk) != code:
+        return None
+    return pk
+
+
+MAX_CODE_LENGTH = len(encode(MAX_PK))
+
+
+class RecipeExistsCache:
+    """Существует ли рецепт: LRU-кеш в памяти процесса.
+
+    Хранит и существующие, и отсутствующие id (отрицательный кеш), не
+    больше size записей. Записи сбрасываются при создании и удалении
+    рецептов в этом процессе, а в остальных воркерах устаревают через
+    timeout секунд. С репликами (foodgram_backend.replicas) отсутствие
+    рецепта проверяется ещё и в основной базе: отстающая реплика не
+    должна попасть в отрицательный кеш.
+    """
+
+    def __init__(self, size=SHORT_LINK_CACHE_SIZE,
+                 timeout=SHORT_LINK_CACHE_TIMEOUT):
+        """Пустой кеш."""
+        self.size = size
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, pk):
+        """Значение из кеша; None, если его нет или оно устарело."""
+        with self.lock:
+            entry = self.entries.get(pk)
+            if entry is None or entry[1] <= time.monotonic():
+                return None
+            self.entries.move_to_end(pk)
+            return entry[0]
+
+    def set(self, pk, exists):
+        """Запись значения с вытеснением самых давних записей."""
+        with self.lock:
+            self.entries[pk] = (exists, time.monotonic() + self.timeout)
+            self.entries.move_to_end(pk)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def exists(self, pk):
+        """Существует ли рецепт с id=pk."""
+        exists = self.get(pk)
+        if exists is None:
+            exists = Recipe.objects.filter(pk=pk).exists() or (
+                bool(settings.DB_REPLICAS) and Recipe.objects.using(
+                    DEFAULT_DB_ALIAS
+                ).filter(pk=pk).exists()
+            )
+            self.set(pk, exists)
+        return exists
+
+    async def aexists(self, pk):
+        """Существует ли рецепт с id=pk, через асинхронный ORM."""
+        exists = self.get(pk)
+        if exists is None:
+            exists = await Recipe.objects.filter(pk=pk).aexists() or (
+                bool(settings.DB_REPLICAS) and await Recipe.objects.using(
+                    DEFAULT_DB_ALIAS
+                ).filter(pk=pk).aexists()
+            )
+            self.set(pk, exists)
+        return exists
+
+    def invalidate(self, pk):
+        """Сброс записи рецепта."""
+        with self.lock:
+            self.entries.pop(pk, None)
+
+    def clear(self):
+        """Сброс всех записей."""
+        with self.lock:
+            self.entries.clear()
+
+
+recipe_exists = RecipeExistsCache()
+
+
+def invalidate(pk):
+    """Сброс записи рецепта сразу и после завершения транзакции.
+
+    Второй сброс нужен, если между ними запись снова попала в кеш из
+    ещё не завершённой транзакции.
+    """
+    recipe_exists.invalidate(pk)
+    transaction.on_commit(lambda: recipe_exists.invalidate(pk))
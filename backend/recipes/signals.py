@@ -0,0 +1,158 @@
+"""Сигналы приложения recipes."""
+
+from functools import partial
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from recipes import files, images, shopping_list, short_links, tokens
+from recipes.constants import COOKING_TIME_HISTOGRAM_KEY
+from recipes.counters import COUNTERS, change_counter
+from recipes.ingredient_index import remove, schedule_build
+from recipes.models import DBUser, Ingredient, Recipe, ShoppingCart, Tag
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def rebuild_ingredient_index(**kwargs):
+    """Пересборка индекса продуктов после изменения продукта."""
+    schedule_build()
+
+
+@receiver(post_migrate)
+def remove_ingredient_index(sender, using, **kwargs):
+    """Сброс индекса продуктов после миграций и очистки базы.
+
+    Снимок пересобирается при следующем поиске: после миграции назад
+    таблицы продуктов может уже не быть.
+    """
+    if sender.name == 'recipes' and using == DEFAULT_DB_ALIAS:
+        remove()
+
+
+@receiver((post_save, pre_delete), sender=Tag)
+def touch_tag_recipes(instance, **kwargs):
+    """Отметка об изменении рецептов с изменённым тегом."""
+    Recipe.objects.filter(tags=instance).update(updated_at=timezone.now())
+
+
+@receiver((post_save, pre_delete), sender=Ingredient)
+def touch_ingredient_recipes(instance, **kwargs):
+    """Отметка об изменении рецептов с изменённым продуктом."""
+    Recipe.objects.filter(ingredients=instance).update(
+        updated_at=timezone.now()
+    )
+
+
+@receiver(post_save, sender=DBUser)
+def touch_author_recipes(instance, update_fields=None, **kwargs):
+    """Отметка об изменении рецептов автора (имя, аватар)."""
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    Recipe.objects.filter(author=instance).update(updated_at=timezone.now())
+
+
+def saves_image(instance, update_fields):
+    """Сохраняется ли поле изображения объекта."""
+    return update_fields is None or (
+        images.IMAGE_FIELDS[type(instance)] in update_fields
+    )
+
+
+@receiver(pre_save, sender=Recipe)
+@receiver(pre_save, sender=DBUser)
+def remember_image(instance, update_fields=None, **kwargs):
+    """Файл изображения до сохранения."""
+    if saves_image(instance, update_fields):
+        files.remember_name(instance)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=DBUser)
+def update_image(instance, update_fields=None, **kwargs):
+    """Ссылки на файлы и копии нового изображения рецепта или аватара."""
+    if saves_image(instance, update_fields):
+        files.update_references(instance)
+        images.schedule(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=DBUser)
+def release_image(instance, **kwargs):
+    """Ссылка на файл изображения удалённого объекта."""
+    files.update_references(instance, deleted=True)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def reset_cooking_time_histogram(**kwargs):
+    """Сброс количества рецептов по времени готовки для админки."""
+    cache.delete(COOKING_TIME_HISTOGRAM_KEY)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def reset_recipe_exists(instance, created=True, **kwargs):
+    """Сброс проверки существования рецепта для коротких ссылок."""
+    if created:
+        short_links.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=DBUser)
+def reset_user_tokens(instance, created, **kwargs):
+    """Сброс кеша токенов пользователя (пароль, активность, аватар)."""
+    if not created:
+        tokens.invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def reset_token(instance, **kwargs):
+    """Сброс кеша удалённого токена (выход, удаление пользователя)."""
+    tokens.invalidate([instance.key])
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(instance, created, **kwargs):
+    """Продукты рецепта добавляются в список покупок."""
+    if created:
+        shopping_list.add_recipe(instance.user, instance.recipe)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(instance, **kwargs):
+    """Продукты рецепта убираются из списка покупок.
+
+    pre_delete, а не post_delete: при каскадном удалении рецепта его
+    продукты к post_delete могут быть уже удалены.
+    """
+    shopping_list.remove_recipe(instance.user, instance.recipe)
+
+
+def count_created(model, field, related_field, instance, created, **kwargs):
+    """Увеличение счётчика при создании записи."""
+    if created:
+        change_counter(
+            model, field, getattr(instance, f'{related_field}_id'), 1
+        )
+
+
+def count_deleted(model, field, related_field, instance, **kwargs):
+    """Уменьшение счётчика при удалении записи (и каскадном тоже)."""
+    change_counter(model, field, getattr(instance, f'{related_field}_id'), -1)
+
+
+for counter_label, field, related_label, related_field in COUNTERS:
+    model = apps.get_model(counter_label)
+    sender = apps.get_model(related_label)
+    uid = f'{counter_label}.{field}'
+    post_save.connect(
+        partial(count_created, model, field, related_field),
+        sender=sender, weak=False, dispatch_uid=f'{uid}.created'
+    )
+    post_delete.connect(
+        partial(count_deleted, model, field, related_field),
+        sender=sender, weak=False, dispatch_uid=f'{uid}.deleted'
+    )
@@ -0,0 +1,74 @@
+"""
+Хранилище файлов с именами по содержимому.
+
+Имя файла - SHA-256 его содержимого с исходным расширением в каталоге
+upload_to, поэтому одинаковые файлы хранятся один раз, а файл по
+одному и тому же адресу никогда не меняется (nginx отдаёт такие файлы
+с Cache-Control: immutable). Удаляются файлы только когда на них не
+остаётся ссылок (recipes.files).
+
+Готовый файл проверяется под блокировкой строки StoredFile, как в
+recipes.files.collect: если удаление уже идёт, запись ждёт его и
+создаёт файл заново. Сохранять объекты с файлами нужно в транзакции,
+чтобы блокировка держалась до ссылки на файл.
+"""
+
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+
+from recipes.models import StoredFile
+
+
+def lock_stored_file(name):
+    """Блокировка строки StoredFile файла до конца транзакции."""
+    list(StoredFile.objects.select_for_update().filter(name=name))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище с именами по SHA-256 содержимого."""
+
+    def get_available_name(self, name, max_length=None):
+        """Имя не меняется: одинаковое имя - одинаковое содержимое."""
+        return name
+
+    def _save(self, name, content):
+        """Запись во временный файл с подсчётом хеша и переименование."""
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        full_directory = self.path(directory)
+        if self.directory_permissions_mode is not None:
+            old_umask = os.umask(0o777 & ~self.directory_permissions_mode)
+            try:
+                os.makedirs(full_directory, exist_ok=True)
+            finally:
+                os.umask(old_umask)
+        else:
+            os.makedirs(full_directory, exist_ok=True)
+        digest = hashlib.sha256()
+        descriptor, temp_path = tempfile.mkstemp(dir=full_directory)
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    file.write(chunk)
+            name = os.path.join(directory, digest.hexdigest() + extension)
+            full_path = self.path(name)
+            with transaction.atomic():
+                lock_stored_file(name.replace('\\', '/'))
+                if os.path.exists(full_path):
+                    os.unlink(temp_path)
+                else:
+                    # mkstemp создаёт файл с правами 0o600.
+                    os.chmod(temp_path, self.file_permissions_mode or 0o644)
+                    os.replace(temp_path, full_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        return name.replace('\\', '/')
@@ -0,0 +1,86 @@
+"""Списки админки."""
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from recipes.admin import CookingTimeFilter, RecipeAdmin
+from recipes.models import (DBUser, Favorites, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Subscriptions, Tag)
+
+CHANGELISTS = (
+    'admin:recipes_recipe_changelist',
+    'admin:recipes_dbuser_changelist',
+    'admin:recipes_tag_changelist',
+    'admin:recipes_ingredient_changelist',
+)
+
+
+def add_rows(start, count):
+    """Пользователи, теги, продукты и рецепты с номерами от start.
+
+    Все авторы, кроме первого, подписаны на первого.
+    """
+    for number in range(start, start + count):
+        author = DBUser.objects.create_user(
+            email=f'author{number}@example.com', username=f'author{number}',
+            first_name='Имя', last_name='Фамилия'
+        )
+        tag = Tag.objects.create(name=f'Тег {number}', slug=f'tag{number}')
+        ingredient = Ingredient.objects.create(
+            name=f'Продукт {number}', measurement_unit='г'
+        )
+        recipe = Recipe.objects.create(
+            name=f'Рецепт {number}', text='Описание', cooking_time=number + 1,
+            image='recipes/images/recipe.png', author=author
+        )
+        recipe.tags.add(tag)
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=ingredient, amount=number + 1
+        )
+        Favorites.objects.create(user=author, recipe=recipe)
+        ShoppingCart.objects.create(user=author, recipe=recipe)
+        if number:
+            Subscriptions.objects.create(
+                subscriber=author,
+                author=DBUser.objects.get(username='author0')
+            )
+
+
+def count_queries(client, url):
+    """Число запросов к базе при GET url."""
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(context.captured_queries)
+
+
+@pytest.mark.parametrize('changelist', CHANGELISTS)
+def test_changelist_queries(changelist, admin_client):
+    """Список из нескольких и из многих строк - одно число запросов."""
+    url = reverse(changelist)
+    add_rows(0, 2)
+    queries = count_queries(admin_client, url)
+    add_rows(2, 40)
+    assert count_queries(admin_client, url) == queries
+
+
+@pytest.mark.parametrize('buckets, labels', (
+    (2, ['Быстрее 6 мин (6)', 'Долго (6)']),
+    (4, [
+        'Быстрее 3 мин (3)', 'Быстрее 6 мин (3)', 'Быстрее 9 мин (3)',
+        'Долго (3)'
+    ]),
+))
+def test_cooking_time_buckets(buckets, labels, admin_client, monkeypatch):
+    """Число частей фильтра времени готовки задаётся в RecipeAdmin."""
+    monkeypatch.setattr(RecipeAdmin, 'cooking_time_buckets', buckets)
+    add_rows(0, 12)
+    response = admin_client.get(reverse('admin:recipes_recipe_changelist'))
+    assert response.status_code == 200
+    spec = next(
+        spec for spec in response.context['cl'].filter_specs
+        if isinstance(spec, CookingTimeFilter)
+    )
+    assert [label for _, label in spec.lookup_choices] == labels
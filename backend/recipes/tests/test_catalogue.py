@@ -0,0 +1,144 @@
+"""Загрузка и синхронизация справочников (recipes.catalogue)."""
+
+import io
+import json
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+
+from recipes import catalogue
+from recipes.catalogue import CATALOGUES, CatalogueLoader, read_rows
+from recipes.models import Ingredient, Recipe, Tag
+
+METHODS = (
+    'bulk',
+    pytest.param('copy', marks=pytest.mark.skipif(
+        connection.vendor != 'postgresql', reason='COPY только в PostgreSQL'
+    )),
+)
+INGREDIENTS_CSV = (
+    'name,measurement_unit\n'
+    'Соль,г\n'
+    'Сахар,г\n'
+    'Сахар,г\n'
+    'Мука,кг\n'
+    ',г\n'
+    'Перец\n'
+)
+TAGS = [
+    {'name': 'Завтрак', 'slug': 'breakfast'},
+    {'name': 'Полдник', 'slug': 'lunch'},
+    {'name': 'Десерт', 'slug': 'dessert'},
+    {'name': 'Ещё десерт', 'slug': 'dessert'},
+    {'name': 'Без слага'},
+    {'name': 'Другой', 'slug': 'other'},
+]
+
+
+def make_loader(name, method):
+    """Загрузчик справочника name частями по две строки."""
+    model, fields, key = CATALOGUES[name]
+    return CatalogueLoader(model, fields, 2, method, key=key)
+
+
+@pytest.fixture
+def tags(user):
+    """Теги; рецепт с тегами lunch и dinner изменён давно."""
+    tags = {
+        slug: Tag.objects.create(name=name, slug=slug)
+        for name, slug in (
+            ('Завтрак', 'breakfast'), ('Обед', 'lunch'), ('Ужин', 'dinner'),
+            ('Старый', 'old'), ('Другой', 'other'),
+        )
+    }
+    recipe = Recipe.objects.create(
+        name='Рецепт', text='Описание', cooking_time=1,
+        image='recipes/images/recipe.png', author=user
+    )
+    recipe.tags.set([tags['lunch'], tags['dinner']])
+    Recipe.objects.filter(pk=recipe.pk).update(
+        updated_at=timezone.now() - timezone.timedelta(days=1)
+    )
+    return tags
+
+
+@pytest.mark.parametrize('method', METHODS)
+def test_load(method, db):
+    """Новые строки добавляются, повторы и ошибки считаются в итогах."""
+    Ingredient.objects.create(name='Соль', measurement_unit='г')
+    loader = make_loader('ingredients', method)
+    progress = []
+    stats = loader.load(
+        read_rows('ingredients.csv', io.StringIO(INGREDIENTS_CSV),
+                  loader.fields),
+        lambda stats: progress.append(stats.processed)
+    )
+    assert (stats.inserted, stats.skipped, stats.failed) == (2, 2, 2)
+    assert [number for number, _ in stats.errors] == [6, 7]
+    assert progress == [2, 4, 6]
+    assert set(Ingredient.objects.values_list(
+        'name', 'measurement_unit'
+    )) == {('Соль', 'г'), ('Сахар', 'г'), ('Мука', 'кг')}
+
+
+@pytest.mark.parametrize('method', METHODS)
+@pytest.mark.parametrize('dry_run', (False, True))
+def test_sync(method, dry_run, tags, monkeypatch):
+    """Добавляются новые и изменяются отличающиеся записи.
+
+    Записи, которых нет в файле, удаляются, кроме используемых в
+    рецептах. С dry_run справочник не меняется. JSON читается
+    маленькими частями.
+    """
+    monkeypatch.setattr(catalogue, 'READ_SIZE', 7)
+    before = set(Tag.objects.values_list('name', 'slug'))
+    updated_at = Recipe.objects.get().updated_at
+    loader = make_loader('tags', method)
+    stats = loader.sync(
+        read_rows('tags.json', io.StringIO(json.dumps(TAGS)), loader.fields),
+        delete=True, dry_run=dry_run
+    )
+    assert (
+        stats.inserted, stats.updated, stats.unchanged, stats.deleted,
+        stats.kept, stats.skipped, stats.failed
+    ) == (1, 1, 2, 1, 1, 1, 1)
+    assert [number for number, _ in stats.errors] == [5]
+    if dry_run:
+        assert set(Tag.objects.values_list('name', 'slug')) == before
+        assert Recipe.objects.get().updated_at == updated_at
+        return
+    assert set(Tag.objects.values_list('name', 'slug')) == {
+        ('Завтрак', 'breakfast'), ('Полдник', 'lunch'), ('Ужин', 'dinner'),
+        ('Десерт', 'dessert'), ('Другой', 'other'),
+    }
+    assert Tag.objects.get(slug='breakfast') == tags['breakfast']
+    assert Recipe.objects.get().updated_at > updated_at
+
+
+def test_import_command(tags, tmp_path, settings):
+    """Итоги загрузки и синхронизации в выводе команды."""
+    settings.INGREDIENTS_INDEX_PATH = str(tmp_path / 'ingredients.idx')
+    ingredients = tmp_path / 'ingredients.csv'
+    ingredients.write_text(INGREDIENTS_CSV, encoding='utf-8')
+    output = io.StringIO()
+    errors = io.StringIO()
+    call_command(
+        'import_catalogue', str(ingredients), '--method', 'bulk',
+        stdout=output, stderr=errors
+    )
+    assert 'добавлено 3, пропущено 1, с ошибками 2' in output.getvalue()
+    assert f'{ingredients}, строка 6:' in errors.getvalue()
+    tags_file = tmp_path / 'tags.json'
+    tags_file.write_text(json.dumps(TAGS), encoding='utf-8')
+    output = io.StringIO()
+    call_command(
+        'import_catalogue', str(tags_file), '--sync', '--delete',
+        stdout=output, stderr=io.StringIO()
+    )
+    assert (
+        'добавлено 1, изменено 1, без изменений 2, удалено 1 '
+        '(оставлено используемых в рецептах 1), пропущено 1, '
+        'с ошибками 1'
+    ) in output.getvalue()
@@ -0,0 +1,62 @@
+"""Счётчики recipes.counters."""
+
+import importlib
+
+from django.apps import apps
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+
+from recipes.counters import reconcile
+from recipes.models import DBUser, Recipe, Subscriptions
+
+
+def make_recipe(author):
+    """Рецепт автора author."""
+    return Recipe.objects.create(
+        name='Рецепт', text='Описание', cooking_time=1,
+        image='recipes/images/recipe.png', author=author
+    )
+
+
+def test_save_keeps_counters(make_user):
+    """Сохранение загруженного раньше объекта не меняет его счётчики."""
+    author = make_user(1)
+    stale = DBUser.objects.get(pk=author.pk)
+    Subscriptions.objects.create(subscriber=make_user(2), author=author)
+    make_recipe(author)
+    stale.first_name = 'Другое имя'
+    stale.save()
+    author.refresh_from_db()
+    assert author.first_name == 'Другое имя'
+    assert (author.subscribers_count, author.recipes_count) == (1, 1)
+
+
+def test_reconcile(make_user):
+    """Функция reconcile исправляет только разошедшиеся счётчики."""
+    author = make_user(1)
+    make_recipe(author)
+    DBUser.objects.filter(pk=author.pk).update(recipes_count=5)
+    fixed = reconcile(apps)
+    assert fixed['DBUser.recipes_count'] == 1
+    assert fixed['DBUser.subscribers_count'] == 0
+    author.refresh_from_db()
+    assert author.recipes_count == 1
+
+
+def test_migration_fills_counters(make_user):
+    """Миграция 0010 считает счётчики по историческим моделям."""
+    author = make_user(1)
+    make_recipe(author)
+    Subscriptions.objects.create(subscriber=make_user(2), author=author)
+    DBUser.objects.update(
+        recipes_count=0, subscribers_count=0, subscriptions_count=0
+    )
+    loader = MigrationLoader(connection)
+    migration = importlib.import_module(
+        'recipes.migrations.0010_counters'
+    )
+    migration.fill_counters(
+        loader.project_state(('recipes', '0010_counters')).apps, None
+    )
+    author.refresh_from_db()
+    assert (author.recipes_count, author.subscribers_count) == (1, 1)
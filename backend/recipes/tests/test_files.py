@@ -0,0 +1,90 @@
+"""Ссылки на файлы в хранилище с именами по содержимому."""
+
+import threading
+import time
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+
+from recipes.files import add_reference, collect, remove_reference
+from recipes.models import StoredFile
+
+CONTENT = b'image'
+
+
+@pytest.fixture(autouse=True)
+def media(settings, tmp_path):
+    """Хранилище во временном каталоге."""
+    settings.MEDIA_ROOT = str(tmp_path)
+
+
+def save():
+    """Запись файла в хранилище; имя по содержимому."""
+    return default_storage.save('recipes/images/a.png', ContentFile(CONTENT))
+
+
+def test_shared_file_deleted_with_last_reference(
+    db, django_capture_on_commit_callbacks
+):
+    """Общий файл удаляется только вместе с последней ссылкой."""
+    name = save()
+    assert save() == name
+    add_reference(name)
+    add_reference(name)
+    with django_capture_on_commit_callbacks(execute=True):
+        remove_reference(name)
+    assert default_storage.exists(name)
+    with django_capture_on_commit_callbacks(execute=True):
+        remove_reference(name)
+    assert not default_storage.exists(name)
+    assert not StoredFile.objects.filter(name=name).exists()
+
+
+def test_save_after_collect_recreates_file(db):
+    """Файл, удалённый до записи, создаётся заново."""
+    name = save()
+    add_reference(name)
+    remove_reference(name)
+    collect(name)
+    assert save() == name
+    add_reference(name)
+    assert default_storage.exists(name)
+    assert StoredFile.objects.get(name=name).references == 1
+
+
+@pytest.mark.skipif(
+    connection.vendor != 'postgresql',
+    reason='Блокировки строк есть только в PostgreSQL.'
+)
+def test_collect_waits_for_save_in_transaction(transactional_db):
+    """Удаление ждёт транзакцию, которая нашла файл готовым."""
+    name = save()
+    add_reference(name)
+    StoredFile.objects.filter(name=name).update(references=0)
+    saved = threading.Event()
+
+    def save_and_reference():
+        with transaction.atomic():
+            save()
+            saved.set()
+            time.sleep(0.5)
+            add_reference(name)
+        connection.close()
+
+    def collect_in_thread():
+        saved.wait()
+        collect(name)
+        connection.close()
+
+    threads = [
+        threading.Thread(target=save_and_reference),
+        threading.Thread(target=collect_in_thread),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert default_storage.exists(name)
+    assert StoredFile.objects.get(name=name).references == 1
@@ -0,0 +1,94 @@
+"""Индекс продуктов (recipes.ingredient_index)."""
+
+import pytest
+from django.apps import apps
+from django.db import transaction
+
+from recipes import ingredient_index
+from recipes.ingredient_index import IngredientIndex, build
+from recipes.models import Ingredient
+from recipes.signals import remove_ingredient_index
+
+
+@pytest.fixture
+def path(settings, tmp_path):
+    """Файл снимка во временном каталоге."""
+    settings.INGREDIENTS_INDEX_PATH = str(tmp_path / 'ingredients.idx')
+    return settings.INGREDIENTS_INDEX_PATH
+
+
+def names(index, prefix):
+    """Названия продуктов, найденных по началу названия."""
+    return [ingredient['name'] for ingredient in index.search(prefix, 10)]
+
+
+def test_search(db, path):
+    """Поиск по началу названия без учёта регистра."""
+    Ingredient.objects.bulk_create(
+        Ingredient(name=name, measurement_unit='г')
+        for name in ('Сахар', 'сахарная пудра', 'Соль')
+    )
+    assert names(IngredientIndex(), 'САХ') == ['Сахар', 'сахарная пудра']
+
+
+def test_stale_file_rebuilt_on_open(db, path):
+    """Снимок, не совпадающий с таблицей, пересобирается при открытии."""
+    build()
+    Ingredient.objects.bulk_create(
+        [Ingredient(name='Мука', measurement_unit='г')]
+    )
+    assert names(IngredientIndex(), 'Му') == ['Мука']
+
+
+def test_file_of_other_database_rebuilt(db, path, monkeypatch):
+    """Снимок другой базы с теми же продуктами не используется."""
+    Ingredient.objects.create(name='Мука', measurement_unit='г')
+    with monkeypatch.context() as patch:
+        patch.setattr(
+            ingredient_index, 'get_database', lambda: ('other', 'db', '', '')
+        )
+        build()
+    index = IngredientIndex()
+    assert names(index, 'Му') == ['Мука']
+    assert index.db_stamp == ingredient_index.get_stamp()
+
+
+def test_periodic_check(db, path, monkeypatch):
+    """Открытый снимок сверяется с базой раз в интервал."""
+    index = IngredientIndex()
+    assert names(index, 'Му') == []
+    Ingredient.objects.bulk_create(
+        [Ingredient(name='Мука', measurement_unit='г')]
+    )
+    assert names(index, 'Му') == []
+    monkeypatch.setattr(
+        ingredient_index, 'INGREDIENTS_INDEX_CHECK_INTERVAL', 0
+    )
+    assert names(index, 'Му') == ['Мука']
+
+
+def test_post_migrate_removes_file(db, path):
+    """После миграций снимок удаляется и собирается заново."""
+    build()
+    remove_ingredient_index(
+        sender=apps.get_app_config('recipes'), using='default'
+    )
+    with pytest.raises(FileNotFoundError):
+        open(path)
+
+
+def test_schedule_build_after_rollback(
+    db, path, monkeypatch, django_capture_on_commit_callbacks
+):
+    """Откат не мешает следующим пересборкам, повторы - одна сборка."""
+    builds = []
+    monkeypatch.setattr(
+        ingredient_index, 'build', lambda: builds.append(1)
+    )
+    with django_capture_on_commit_callbacks(execute=True):
+        with pytest.raises(RuntimeError), transaction.atomic():
+            ingredient_index.schedule_build()
+            raise RuntimeError
+        ingredient_index.schedule_build()
+        ingredient_index.schedule_build()
+    assert builds == [1]
@@ -0,0 +1,144 @@
+"""Суммы продуктов списков покупок (recipes.shopping_list)."""
+
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import (Ingredient, Recipe, RecipeIngredient, ShoppingCart,
+                            ShoppingCartIngredient, Tag)
+from recipes.shopping_list import apply_delta, rebuild
+
+
+def get_totals(user):
+    """Суммы продуктов списка покупок пользователя: {id продукта: сумма}."""
+    return dict(ShoppingCartIngredient.objects.filter(
+        user=user
+    ).values_list('ingredient', 'total_amount'))
+
+
+@pytest.fixture
+def ingredients(db):
+    """Три продукта."""
+    return [
+        Ingredient.objects.create(
+            name=f'Продукт {number}', measurement_unit='г'
+        )
+        for number in range(3)
+    ]
+
+
+@pytest.fixture
+def make_recipe(make_user, ingredients):
+    """Создание рецепта автора author с продуктами {номер: количество}."""
+    def make(author, amounts):
+        recipe = Recipe.objects.create(
+            name='Рецепт', text='Описание', cooking_time=1,
+            image='recipes/images/recipe.png', author=author
+        )
+        recipe.tags.add(Tag.objects.get_or_create(name='Тег', slug='tag')[0])
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe, ingredient=ingredients[number], amount=amount
+            )
+            for number, amount in amounts.items()
+        )
+        return recipe
+    return make
+
+
+def test_cart_and_patch_deltas(
+    make_user, make_recipe, ingredients, user, user_client
+):
+    """Добавление, изменение продуктов рецепта и удаление из списка."""
+    author = make_user(1)
+    first = make_recipe(author, {0: 100, 1: 2})
+    second = make_recipe(author, {0: 50})
+    for recipe in (first, second):
+        response = user_client.post(f'/api/recipes/{recipe.pk}/shopping_cart/')
+        assert response.status_code == 201
+    assert get_totals(user) == {ingredients[0].pk: 150, ingredients[1].pk: 2}
+
+    author_client = APIClient()
+    author_client.credentials(
+        HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=author).key}'
+    )
+    response = author_client.patch(f'/api/recipes/{first.pk}/', {
+        'tags': [Tag.objects.get().pk],
+        'ingredients': [
+            {'id': ingredients[0].pk, 'amount': 10},
+            {'id': ingredients[2].pk, 'amount': 3},
+        ],
+    }, format='json')
+    assert response.status_code == 200, response.content
+    assert get_totals(user) == {ingredients[0].pk: 60, ingredients[2].pk: 3}
+
+    response = user_client.delete(f'/api/recipes/{first.pk}/shopping_cart/')
+    assert response.status_code == 204
+    assert get_totals(user) == {ingredients[0].pk: 50}
+
+
+def test_apply_delta_existing_and_drifted_rows(user, ingredients):
+    """Существующая строка увеличивается, сумма не уходит ниже нуля."""
+    ShoppingCartIngredient.objects.create(
+        user=user, ingredient=ingredients[0], total_amount=5
+    )
+    apply_delta([user.pk], {ingredients[0].pk: 3, ingredients[1].pk: 4})
+    assert get_totals(user) == {ingredients[0].pk: 8, ingredients[1].pk: 4}
+    apply_delta([user.pk], {ingredients[0].pk: -20, ingredients[1].pk: -1})
+    assert get_totals(user) == {ingredients[1].pk: 3}
+
+
+def test_admin_recipe_ingredient_changes(
+    admin_client, make_user, make_recipe, ingredients, user
+):
+    """Изменение и удаление продукта рецепта в админке."""
+    recipe = make_recipe(make_user(1), {0: 100})
+    other = make_recipe(make_user(2), {1: 1})
+    ShoppingCart.objects.create(user=user, recipe=recipe)
+    ShoppingCart.objects.create(user=user, recipe=other)
+    recipe_ingredient = RecipeIngredient.objects.get(recipe=recipe)
+    response = admin_client.post(
+        reverse(
+            'admin:recipes_recipeingredient_change',
+            args=(recipe_ingredient.pk,)
+        ),
+        {
+            'recipe': other.pk,
+            'ingredient': ingredients[0].pk,
+            'amount': 30,
+        }
+    )
+    assert response.status_code == 302
+    assert get_totals(user) == {ingredients[0].pk: 30, ingredients[1].pk: 1}
+    response = admin_client.post(
+        reverse(
+            'admin:recipes_recipeingredient_delete',
+            args=(recipe_ingredient.pk,)
+        ),
+        {'post': 'yes'}
+    )
+    assert response.status_code == 302
+    assert get_totals(user) == {ingredients[1].pk: 1}
+
+
+def test_rebuild(make_user, make_recipe, ingredients, user):
+    """Пересчёт исправляет, добавляет и удаляет разошедшиеся строки."""
+    ShoppingCart.objects.create(
+        user=user, recipe=make_recipe(make_user(1), {0: 100, 1: 2})
+    )
+    ShoppingCartIngredient.objects.filter(ingredient=ingredients[0]).update(
+        total_amount=7
+    )
+    ShoppingCartIngredient.objects.filter(ingredient=ingredients[1]).delete()
+    ShoppingCartIngredient.objects.create(
+        user=user, ingredient=ingredients[2], total_amount=9
+    )
+    assert rebuild() == {'created': 1, 'updated': 1, 'deleted': 1}
+    assert get_totals(user) == {ingredients[0].pk: 100, ingredients[1].pk: 2}
+    output = StringIO()
+    call_command('rebuild_shopping_lists', stdout=output)
+    assert 'добавлено 0, изменено 0, удалено 0' in output.getvalue()
@@ -0,0 +1,100 @@
+"""
+Кеш токенов для аутентификации.
+
+При TOKEN_CACHE токен вместе с пользователем кешируется на
+TOKEN_CACHE_TIMEOUT секунд, чтобы не выполнять запрос Token JOIN DBUser
+на каждый запрос. Запись сбрасывается при удалении токена (выход через
+djoser) и при сохранении пользователя (смена пароля, деактивация,
+аватар, копии аватара), а изменения в обход сигналов (update(), SQL)
+воркеры видят только через TOKEN_CACHE_TIMEOUT. Пользователь из кеша
+нужен только для чтения: запросы на запись берут его из базы
+(api.authentication). Ключ кеша - хеш токена, сам токен в ключ не
+попадает.
+
+Сброс виден всем воркерам, только если кеш у них общий (Redis,
+Memcached). С кешем в памяти процесса (LocMemCache) сброс дошёл бы лишь
+до одного воркера, а остальные до TOKEN_CACHE_TIMEOUT принимали бы
+отозванный токен, поэтому с ним токены не кешируются
+(предупреждение recipes.W001).
+"""
+
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from rest_framework.authtoken.models import Token
+
+from recipes.constants import TOKEN_CACHE_TIMEOUT
+
+# Кеши, свои у каждого процесса.
+LOCAL_CACHES = (LocMemCache, DummyCache)
+
+
+def is_shared_cache():
+    """Общий ли для воркеров кеш по умолчанию."""
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], LOCAL_CACHES)
+
+
+def is_enabled():
+    """Кешируются ли токены: TOKEN_CACHE и общий кеш."""
+    return settings.TOKEN_CACHE and is_shared_cache()
+
+
+def get_cache_key(key):
+    """Ключ кеша токена."""
+    return 'token:' + sha256(key.encode()).hexdigest()
+
+
+def get_query(key):
+    """Запрос токена с пользователем."""
+    return Token.objects.select_related('user').filter(key=key)
+
+
+def get_token(key):
+    """Токен с пользователем; None, если токена нет."""
+    if not is_enabled():
+        return get_query(key).first()
+    cache_key = get_cache_key(key)
+    token = cache.get(cache_key)
+    if token is None:
+        token = get_query(key).first()
+        if token is not None:
+            cache.set(cache_key, token, TOKEN_CACHE_TIMEOUT)
+    return token
+
+
+async def aget_token(key):
+    """Токен с пользователем через асинхронный ORM."""
+    if not is_enabled():
+        return await get_query(key).afirst()
+    cache_key = get_cache_key(key)
+    token = await cache.aget(cache_key)
+    if token is None:
+        token = await get_query(key).afirst()
+        if token is not None:
+            await cache.aset(cache_key, token, TOKEN_CACHE_TIMEOUT)
+    return token
+
+
+def invalidate(keys):
+    """Сброс токенов сразу и после завершения транзакции.
+
+    Второй сброс нужен, если между ними токен снова попал в кеш из
+    ещё не завершённой транзакции.
+    """
+    cache_keys = [get_cache_key(key) for key in keys]
+    if cache_keys and is_enabled():
+        cache.delete_many(cache_keys)
+        transaction.on_commit(lambda: cache.delete_many(cache_keys))
+
+
+def invalidate_user(user_id):
+    """Сброс токенов пользователя."""
+    if not is_enabled():
+        return
+    invalidate(list(
+        Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+    ))
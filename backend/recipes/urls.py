@@ -1,9 +1,18 @@
 """Url адреса приложения recipes."""
 
+from django.conf import settings
 from django.urls import path
 
-from recipes.views import redirect_view
+from recipes import views
+
+if settings.ASYNC_READ_VIEWS:
+    redirect_view = views.async_redirect_view
+    legacy_redirect_view = views.async_legacy_redirect_view
+else:
+    redirect_view = views.redirect_view
+    legacy_redirect_view = views.legacy_redirect_view
 
 urlpatterns = [
-    path('s/<int:id>/', view=redirect_view, name='short_url_view'),
+    path('s/<int:id>/', view=legacy_redirect_view, name='legacy_short_url'),
+    path('s/<str:code>/', view=redirect_view, name='short_url_view'),
 ]
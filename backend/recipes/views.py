@@ -1,13 +1,55 @@
 """RecipeDetailView - Ссылка на рецепт."""
 
-from django.http import Http404
+from django.http import HttpResponseNotFound
 from django.shortcuts import redirect
+from django.utils.cache import patch_cache_control
 
-from recipes.models import Recipe
+from recipes.constants import SHORT_LINK_MAX_AGE, SHORT_LINK_NOT_FOUND_MAX_AGE
+from recipes.short_links import decode, recipe_exists
 
 
-def redirect_view(request, id):
+def get_redirect(pk, exists):
+    """Переадресация на рецепт, которую могут кешировать nginx и браузер.
+
+    Ответ 404 тоже кешируется, но недолго.
+    """
+    if not exists:
+        response = HttpResponseNotFound('Рецепт не существует.')
+        max_age = SHORT_LINK_NOT_FOUND_MAX_AGE
+    else:
+        response = redirect(f'/recipes/{pk}')
+        max_age = SHORT_LINK_MAX_AGE
+    patch_cache_control(response, public=True, max_age=max_age)
+    return response
+
+
+def redirect_to_recipe(pk):
+    """Переадресация на рецепт с id=pk."""
+    return get_redirect(pk, pk is not None and recipe_exists.exists(pk))
+
+
+async def aredirect_to_recipe(pk):
+    """Переадресация на рецепт с id=pk через асинхронный ORM."""
+    return get_redirect(
+        pk, pk is not None and await recipe_exists.aexists(pk)
+    )
+
+
+def redirect_view(request, code):
     """переадресация с короткой ссылки."""
-    if not Recipe.objects.filter(pk=id).exists():
-        raise Http404('Рецепт с id={id} не существует.')
-    return redirect(f'/recipes/{id}')
+    return redirect_to_recipe(decode(code))
+
+
+def legacy_redirect_view(request, id):
+    """переадресация со старой короткой ссылки /s/<id>/."""
+    return redirect_to_recipe(id)
+
+
+async def async_redirect_view(request, code):
+    """переадресация с короткой ссылки под ASGI."""
+    return await aredirect_to_recipe(decode(code))
+
+
+async def async_legacy_redirect_view(request, id):
+    """переадресация со старой короткой ссылки /s/<id>/ под ASGI."""
+    return await aredirect_to_recipe(id)